@@ -1,26 +1,67 @@
-from typing import Any, Sequence
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterable, Sequence
 
+from opentelemetry.metrics import CallbackOptions, Observation
 from opentelemetry.trace import Status, StatusCode, SpanKind
-from sqlalchemy import text
+from sqlalchemy import text, TextClause
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from internal import interface
 
+reserve_ids_query = """
+SELECT nextval(pg_get_serial_sequence(:table, :id_column))
+FROM generate_series(1, :count);
+"""
+
+# Отставание реплики в секундах; 0, если реплика проиграла всё, что получила
+replica_lag_query = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag;
+"""
+
+# До этого момента (time.monotonic) чтения текущего запроса идут в primary
+_primary_pinned_until: ContextVar[float] = ContextVar("primary_pinned_until", default=0.0)
+# Внутри PG.primary() все чтения идут в primary
+_primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+
 
 def NewPool(
         db_user,
         db_pass,
         db_host
         , db_port,
-        db_name
+        db_name,
+        prepared_statement_cache_size: int = 100,
+        pool_size: int = 15,
+        max_overflow: int = 15,
+        pool_recycle: int = 300,
+        pool_pre_ping: bool = False,
+        pool_timeout: float = 30,
+        statement_timeout: int = 0,
 ):
     async_engine = create_async_engine(
         f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}",
         echo=False,
         future=True,
-        pool_size=15,
-        max_overflow=15,
-        pool_recycle=300
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        pool_timeout=pool_timeout,
+        # asyncpg держит LRU подготовленных запросов на каждом соединении
+        connect_args={
+            "prepared_statement_cache_size": prepared_statement_cache_size,
+            # Таймаут по умолчанию в мс, сервер сам отменяет запрос; 0 — без ограничения
+            "server_settings": {"statement_timeout": str(statement_timeout)},
+        },
     )
 
     pool = async_sessionmaker(
@@ -32,41 +73,484 @@ def NewPool(
     return pool
 
 
+class Replica:
+    def __init__(self, host: str, pool: async_sessionmaker, timeout_pools: dict[int, async_sessionmaker]):
+        self.host = host
+        self.pool = pool
+        self.timeout_pools = timeout_pools
+        # До первой проверки отставания реплика считается недоступной
+        self.healthy = False
+        self.lag: float | None = None
+
+
 class PG(interface.IDB):
 
-    def __init__(self, tel: interface.ITelemetry, db_user, db_pass, db_host, db_port, db_name):
-        self.pool = NewPool(db_user, db_pass, db_host, db_port, db_name)
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            statement_cache_size: int = 256,
+            prepared_statement_cache_size: int = 100,
+            pool_size: int = 15,
+            max_overflow: int = 15,
+            replica_hosts: list[str] = None,
+            read_pool_size: int = 15,
+            read_max_overflow: int = 15,
+            replica_max_lag: float = 5.0,
+            replica_check_interval: float = 5.0,
+            pool_recycle: int = 300,
+            pool_pre_ping: bool = False,
+            pool_timeout: float = 30,
+            statement_timeout: int = 0,
+            statement_timeouts: dict[str, int] = None,
+            timeout_pool_size: int = 5,
+            timeout_max_overflow: int = 5,
+    ):
+        self.statement_timeout = statement_timeout
+        self.statement_timeouts = statement_timeouts or {}
+
+        # Запросы с собственным таймаутом идут в отдельные пулы, где он уже задан в server_settings:
+        # SET LOCAL перед каждым запросом стоил бы лишнего обращения к серверу. Размер у них
+        # свой и небольшой, иначе каждый таймаут добавлял бы ещё pool_size + max_overflow соединений
+        timeouts = sorted(set(self.statement_timeouts.values()) - {statement_timeout})
+
+        self.pool = NewPool(
+            db_user, db_pass, db_host, db_port, db_name,
+            prepared_statement_cache_size, pool_size, max_overflow,
+            pool_recycle, pool_pre_ping, pool_timeout, statement_timeout
+        )
+        self.timeout_pools = {
+            timeout: NewPool(
+                db_user, db_pass, db_host, db_port, db_name,
+                prepared_statement_cache_size, timeout_pool_size, timeout_max_overflow,
+                pool_recycle, pool_pre_ping, pool_timeout, timeout
+            )
+            for timeout in timeouts
+        }
         self.tracer = tel.tracer()
+        self.logger = tel.logger()
+
+        self.replicas: list[Replica] = []
+        for replica_host in replica_hosts or []:
+            host, _, port = replica_host.partition(":")
+            replica_pool = NewPool(
+                db_user, db_pass, host, port or db_port, db_name,
+                prepared_statement_cache_size, read_pool_size, read_max_overflow,
+                pool_recycle, pool_pre_ping, pool_timeout, statement_timeout
+            )
+            replica_timeout_pools = {
+                timeout: NewPool(
+                    db_user, db_pass, host, port or db_port, db_name,
+                    prepared_statement_cache_size, timeout_pool_size, timeout_max_overflow,
+                    pool_recycle, pool_pre_ping, pool_timeout, timeout
+                )
+                for timeout in timeouts
+            }
+            self.replicas.append(Replica(replica_host, replica_pool, replica_timeout_pools))
+
+        self.replica_max_lag = replica_max_lag
+        self.replica_check_interval = replica_check_interval
+        self._replica_counter = itertools.count()
+        self._replica_monitor: asyncio.Task | None = None
+
+        # Сессия открытой через transaction() транзакции в текущем контексте
+        self._transaction_session: ContextVar[AsyncSession | None] = ContextVar(
+            f"pg_transaction_session_{id(self)}", default=None
+        )
+
+        meter = tel.meter()
+        self.statement_cache_hits = meter.create_counter(
+            "db.client.statement_cache.hits",
+            description="Количество повторных использований скомпилированных SQL выражений",
+        )
+        self.statement_cache_misses = meter.create_counter(
+            "db.client.statement_cache.misses",
+            description="Количество SQL выражений, скомпилированных заново",
+        )
+
+        self.pool_wait_time = meter.create_histogram(
+            "db.client.connection.wait_time",
+            unit="s",
+            description="Время ожидания соединения из пула",
+        )
+        self.pool_timeouts = meter.create_counter(
+            "db.client.connection.timeouts",
+            description="Количество превышений pool_timeout при получении соединения",
+        )
+        meter.create_observable_gauge(
+            "db.client.connection.count",
+            callbacks=[self._observe_pool_usage],
+            description="Количество выданных из пула соединений",
+        )
+        meter.create_observable_gauge(
+            "db.client.connection.overflow",
+            callbacks=[self._observe_pool_overflow],
+            description="Количество соединений сверх pool_size",
+        )
+
+        self.query_duration = meter.create_histogram(
+            "db.client.operation.duration",
+            unit="s",
+            description="Длительность запросов к базе по имени запроса",
+        )
+
+        self.statement_cache_size = statement_cache_size
+        self._statements: dict[str, TextClause] = {}
+
+    def _pools(self) -> Iterable[tuple[str, async_sessionmaker]]:
+        yield "primary", self.pool
+        for timeout, pool in self.timeout_pools.items():
+            yield f"primary:{timeout}ms", pool
+        for replica in self.replicas:
+            yield replica.host, replica.pool
+            for timeout, pool in replica.timeout_pools.items():
+                yield f"{replica.host}:{timeout}ms", pool
+
+    def _pool_for(
+            self,
+            query_name: str,
+            pool: async_sessionmaker,
+            timeout_pools: dict[int, async_sessionmaker],
+            pool_name: str
+    ) -> tuple[async_sessionmaker, str]:
+        timeout = self.statement_timeouts.get(query_name)
+        if timeout in timeout_pools:
+            return timeout_pools[timeout], f"{pool_name}:{timeout}ms"
+        return pool, pool_name
+
+    def _observe_pool_usage(self, options: CallbackOptions) -> Iterable[Observation]:
+        for pool_name, pool in self._pools():
+            sync_pool = pool.kw["bind"].sync_engine.pool
+            yield Observation(
+                sync_pool.checkedout(),
+                {"db.client.connection.pool.name": pool_name, "db.client.connection.state": "used"}
+            )
+            yield Observation(
+                sync_pool.checkedin(),
+                {"db.client.connection.pool.name": pool_name, "db.client.connection.state": "idle"}
+            )
+
+    def _observe_pool_overflow(self, options: CallbackOptions) -> Iterable[Observation]:
+        for pool_name, pool in self._pools():
+            # QueuePool.overflow() отрицателен, пока не исчерпан pool_size
+            overflow = max(pool.kw["bind"].sync_engine.pool.overflow(), 0)
+            yield Observation(overflow, {"db.client.connection.pool.name": pool_name})
+
+    @asynccontextmanager
+    async def _session(self, pool: async_sessionmaker, pool_name: str = "primary") -> AsyncIterator[AsyncSession]:
+        async with pool() as session:
+            started = time.perf_counter()
+            try:
+                # Явно берем соединение, чтобы измерить ожидание пула отдельно от запроса
+                await session.connection()
+            except PoolTimeoutError:
+                self.pool_timeouts.add(1, {"db.client.connection.pool.name": pool_name})
+                raise
+            finally:
+                self.pool_wait_time.record(
+                    time.perf_counter() - started,
+                    {"db.client.connection.pool.name": pool_name}
+                )
+
+            yield session
+
+    def _statement(self, query: str) -> TextClause:
+        # text() на каждый вызов разбирает параметры и заново строит ключ кэша компиляции:
+        # ~16 мкс против ~1.5 мкс у готового TextClause на get_employee_by_account_id
+        statement = self._statements.get(query)
+        if statement is not None:
+            self.statement_cache_hits.add(1)
+            return statement
+
+        self.statement_cache_misses.add(1)
+        statement = text(query)
+
+        if len(self._statements) >= self.statement_cache_size:
+            # Вытесняем самое старое выражение, чтобы динамический SQL не раздувал кэш
+            self._statements.pop(next(iter(self._statements)))
+        self._statements[query] = statement
+
+        return statement
+
+    def _pin_primary(self) -> None:
+        # Реплики догоняют primary не мгновенно, поэтому после записи читаем из primary
+        _primary_pinned_until.set(time.monotonic() + self.replica_max_lag)
+
+    def primary_pinned(self) -> bool:
+        return _primary_reads.get() or _primary_pinned_until.get() > time.monotonic()
+
+    @asynccontextmanager
+    async def primary(self) -> AsyncIterator[None]:
+        token = _primary_reads.set(True)
+        try:
+            yield
+        finally:
+            _primary_reads.reset(token)
+
+    def _read_replica(self) -> Replica | None:
+        if not self.replicas:
+            return None
+
+        if self._replica_monitor is None:
+            self._replica_monitor = asyncio.create_task(self._monitor_replicas())
+
+        if self.primary_pinned():
+            return None
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+
+        return healthy[next(self._replica_counter) % len(healthy)]
+
+    async def _replica_lag(self, replica: Replica) -> float:
+        async with self._session(replica.pool, replica.host) as session:
+            result = await self._execute(session, replica_lag_query, {}, "replica_lag", "select")
+            return float(result.scalar())
 
-    async def insert(self, query: str, query_params: dict) -> int:
-        async with self.pool() as session:
-            result = await session.execute(text(query), query_params)
+    async def _monitor_replicas(self) -> None:
+        while True:
+            for replica in self.replicas:
+                try:
+                    replica.lag = await asyncio.wait_for(
+                        self._replica_lag(replica),
+                        timeout=self.replica_check_interval
+                    )
+
+                    healthy = replica.lag <= self.replica_max_lag
+                    if replica.healthy and not healthy:
+                        self.logger.warning(f"Реплика {replica.host} отстает на {replica.lag:.1f}с")
+                    replica.healthy = healthy
+                except Exception as err:
+                    if replica.healthy:
+                        self.logger.warning(f"Реплика {replica.host} недоступна: {err}")
+                    replica.healthy = False
+
+            await asyncio.sleep(self.replica_check_interval)
+
+    def in_transaction(self) -> bool:
+        return self._transaction_session.get() is not None
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        if self._transaction_session.get() is not None:
+            # Вложенный вызов присоединяется к уже открытой транзакции
+            yield
+            return
+
+        async with self._session(self.pool) as session:
+            token = self._transaction_session.set(session)
+            try:
+                yield
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                self._transaction_session.reset(token)
+
+        self._pin_primary()
+
+    @asynccontextmanager
+    async def _write(self, query_name: str = "unnamed") -> AsyncIterator[AsyncSession]:
+        session = self._transaction_session.get()
+        if session is not None:
+            # Внутри transaction() все запросы идут на её соединении с таймаутом по умолчанию
+            yield session
+            return
+
+        pool, pool_name = self._pool_for(query_name, self.pool, self.timeout_pools, "primary")
+        async with self._session(pool, pool_name) as session:
+            yield session
             await session.commit()
+
+        self._pin_primary()
+
+    @asynccontextmanager
+    async def _observe(self, query_name: str, operation: str) -> AsyncIterator[None]:
+        attributes = {"db.query.name": query_name, "db.operation.name": operation}
+        started = time.perf_counter()
+
+        with self.tracer.start_as_current_span(
+                f"PG.{operation} {query_name}",
+                kind=SpanKind.CLIENT,
+                attributes=attributes
+        ) as span:
+            try:
+                yield
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                attributes = {**attributes, "error.type": err.__class__.__name__}
+                raise
+            finally:
+                self.query_duration.record(time.perf_counter() - started, attributes)
+
+    async def _execute(
+            self,
+            session: AsyncSession,
+            query: str,
+            query_params: dict,
+            query_name: str,
+            operation: str
+    ):
+        async with self._observe(query_name, operation):
+            return await session.execute(self._statement(query), query_params)
+
+    async def insert(self, query: str, query_params: dict, query_name: str = "unnamed") -> int:
+        async with self._write(query_name) as session:
+            result = await self._execute(session, query, query_params, query_name, "insert")
             rows = result.all()
-            return rows[0][0]
+        return rows[0][0]
 
-    async def delete(self, query: str, query_params: dict) -> None:
-        async with self.pool() as session:
-            await session.execute(text(query), query_params)
-            await session.commit()
+    async def bulk_insert(
+            self,
+            table: str,
+            columns: list[str],
+            records: list[tuple],
+            id_column: str = "id",
+            query_name: str = "unnamed"
+    ) -> list[int]:
+        if not records:
+            return []
 
-    async def update(self, query: str, query_params: dict) -> None:
-        async with self.pool() as session:
-            await session.execute(text(query), query_params)
-            await session.commit()
+        async with self._write(query_name) as session:
+            async with self._observe(query_name, "copy"):
+                # COPY не умеет RETURNING, поэтому идентификаторы резервируются заранее одним запросом
+                result = await session.execute(
+                    self._statement(reserve_ids_query),
+                    {"table": table, "id_column": id_column, "count": len(records)}
+                )
+                ids = [row[0] for row in result.all()]
 
-    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
-        async with self.pool() as session:
-            result = await session.execute(text(query), query_params)
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    table,
+                    columns=[id_column, *columns],
+                    records=[(record_id, *record) for record_id, record in zip(ids, records)]
+                )
+
+        return ids
+
+    async def delete(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]:
+        async with self._write(query_name) as session:
+            result = await self._execute(session, query, query_params, query_name, "delete")
+            return result.all() if result.returns_rows else []
+
+    async def update(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]:
+        async with self._write(query_name) as session:
+            result = await self._execute(session, query, query_params, query_name, "update")
+            return result.all() if result.returns_rows else []
+
+    async def select(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]:
+        session = self._transaction_session.get()
+        if session is not None:
+            result = await self._execute(session, query, query_params, query_name, "select")
+            return result.all()
+
+        replica = self._read_replica()
+        if replica is not None:
+            pool, pool_name = self._pool_for(query_name, replica.pool, replica.timeout_pools, replica.host)
+            try:
+                async with self._session(pool, pool_name) as session:
+                    result = await self._execute(session, query, query_params, query_name, "select")
+                    return result.all()
+            except (OSError, DBAPIError) as err:
+                if isinstance(err, DBAPIError) and not err.connection_invalidated:
+                    raise
+                # Реплика пропала между проверками — до следующей проверки читаем из primary
+                self.logger.warning(f"Реплика {replica.host} недоступна, чтение из primary: {err}")
+                replica.healthy = False
+
+        pool, pool_name = self._pool_for(query_name, self.pool, self.timeout_pools, "primary")
+        async with self._session(pool, pool_name) as session:
+            result = await self._execute(session, query, query_params, query_name, "select")
             rows = result.all()
             return rows
 
+    async def stream(
+            self,
+            query: str,
+            query_params: dict,
+            batch_size: int = 500,
+            query_name: str = "unnamed"
+    ) -> AsyncIterator[Sequence[Any]]:
+        session = self._transaction_session.get()
+        if session is not None:
+            async for rows in self._stream(session, query, query_params, batch_size, query_name):
+                yield rows
+            return
+
+        replica = self._read_replica()
+        if replica is not None:
+            pool, pool_name = self._pool_for(query_name, replica.pool, replica.timeout_pools, replica.host)
+        else:
+            pool, pool_name = self._pool_for(query_name, self.pool, self.timeout_pools, "primary")
+
+        async with self._session(pool, pool_name) as session:
+            async for rows in self._stream(session, query, query_params, batch_size, query_name):
+                yield rows
+
+    async def _stream(
+            self,
+            session: AsyncSession,
+            query: str,
+            query_params: dict,
+            batch_size: int,
+            query_name: str
+    ) -> AsyncIterator[Sequence[Any]]:
+        # Span не открываем: генератор дочитывается уже после выхода из обработчика
+        attributes = {"db.query.name": query_name, "db.operation.name": "stream"}
+        started = time.perf_counter()
+        try:
+            # yield_per включает серверный курсор asyncpg, строки не буферизуются целиком
+            result = await session.stream(
+                self._statement(query), query_params, execution_options={"yield_per": batch_size}
+            )
+            async for rows in result.partitions(batch_size):
+                yield rows
+        finally:
+            self.query_duration.record(time.perf_counter() - started, attributes)
+
     async def multi_query(
             self,
-            queries: list[str]
+            queries: list[str],
+            query_name: str = "unnamed"
     ) -> None:
-        async with self.pool() as session:
-            for query in queries:
-                await session.execute(text(query))
-            await session.commit()
+        async with self._write() as session:
+            async with self._observe(query_name, "multi_query"):
+                # DDL и миграции переписывают таблицы целиком — общий таймаут на них не распространяется
+                if self.statement_timeout:
+                    await session.execute(self._statement("SET LOCAL statement_timeout = 0"))
+                for query in queries:
+                    await session.execute(self._statement(query))
+                if self.statement_timeout and self._transaction_session.get() is session:
+                    await session.execute(
+                        self._statement(f"SET LOCAL statement_timeout = {int(self.statement_timeout)}")
+                    )
+        return None
+
+    async def autocommit_query(
+            self,
+            queries: list[str],
+            query_name: str = "unnamed"
+    ) -> None:
+        # Каждый запрос фиксируется сам: CREATE/DROP INDEX CONCURRENTLY нельзя выполнить внутри транзакции
+        async with self.pool.kw["bind"].connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            async with self._observe(query_name, "autocommit_query"):
+                if self.statement_timeout:
+                    await connection.execute(self._statement("SET statement_timeout = 0"))
+                try:
+                    for query in queries:
+                        await connection.execute(self._statement(query))
+                finally:
+                    if self.statement_timeout:
+                        # Соединение вернётся в пул — таймаут по умолчанию восстанавливается
+                        await connection.execute(self._statement("RESET statement_timeout"))
         return None
@@ -0,0 +1,306 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Sequence
+
+import asyncpg
+from opentelemetry.trace import Status, StatusCode, SpanKind
+
+from internal import interface
+
+reserve_ids_query = """
+SELECT nextval(pg_get_serial_sequence(:table, :id_column))
+FROM generate_series(1, :count);
+"""
+
+# То же правило, по которому SQLAlchemy text() находит именованные параметры
+_BIND_PARAM_RE = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+
+class Record(asyncpg.Record):
+    """asyncpg.Record с доступом к колонкам через атрибуты, как у sqlalchemy.Row."""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def compile_query(query: str) -> tuple[str, tuple[str, ...]]:
+    names: list[str] = []
+
+    def _replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _BIND_PARAM_RE.sub(_replace, query), tuple(names)
+
+
+class RawPG(interface.IDB):
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            pool_min_size: int = 5,
+            pool_max_size: int = 30,
+            pool_recycle: int = 300,
+            statement_cache_size: int = 256,
+            prepared_statement_cache_size: int = 100,
+            statement_timeout: int = 0,
+            statement_timeouts: dict[str, int] = None,
+    ):
+        self.dsn = f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.pool_recycle = pool_recycle
+        self.prepared_statement_cache_size = prepared_statement_cache_size
+        self.tracer = tel.tracer()
+
+        meter = tel.meter()
+        self.statement_cache_hits = meter.create_counter(
+            "db.client.statement_cache.hits",
+            description="Количество повторных использований скомпилированных SQL выражений",
+        )
+        self.statement_cache_misses = meter.create_counter(
+            "db.client.statement_cache.misses",
+            description="Количество SQL выражений, скомпилированных заново",
+        )
+
+        self.query_duration = meter.create_histogram(
+            "db.client.operation.duration",
+            unit="s",
+            description="Длительность запросов к базе по имени запроса",
+        )
+
+        self.statement_timeout = statement_timeout
+        self.statement_timeouts = statement_timeouts or {}
+
+        self.statement_cache_size = statement_cache_size
+        self._statements: dict[str, tuple[str, tuple[str, ...]]] = {}
+
+        self.pool: asyncpg.Pool | None = None
+        self._pool_lock = asyncio.Lock()
+
+        # Соединение открытой через transaction() транзакции в текущем контексте
+        self._transaction_connection: ContextVar[asyncpg.Connection | None] = ContextVar(
+            f"raw_pg_transaction_connection_{id(self)}", default=None
+        )
+
+    async def _pool(self) -> asyncpg.Pool:
+        # Пул asyncpg создаётся только внутри работающего event loop
+        if self.pool is None:
+            async with self._pool_lock:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(
+                        self.dsn,
+                        min_size=self.pool_min_size,
+                        max_size=self.pool_max_size,
+                        max_inactive_connection_lifetime=self.pool_recycle,
+                        statement_cache_size=self.prepared_statement_cache_size,
+                        record_class=Record,
+                        # Таймаут по умолчанию в мс, сервер сам отменяет запрос; 0 — без ограничения
+                        server_settings={"statement_timeout": str(self.statement_timeout)},
+                    )
+        return self.pool
+
+    def _timeout(self, query_name: str) -> float | None:
+        # При истечении таймаута asyncpg отправляет серверу запрос на отмену выполнения
+        timeout = self.statement_timeouts.get(query_name)
+        return timeout / 1000 if timeout else None
+
+    @asynccontextmanager
+    async def _observe(self, query_name: str, operation: str) -> AsyncIterator[None]:
+        attributes = {"db.query.name": query_name, "db.operation.name": operation}
+        started = time.perf_counter()
+
+        with self.tracer.start_as_current_span(
+                f"RawPG.{operation} {query_name}",
+                kind=SpanKind.CLIENT,
+                attributes=attributes
+        ) as span:
+            try:
+                yield
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                attributes = {**attributes, "error.type": err.__class__.__name__}
+                raise
+            finally:
+                self.query_duration.record(time.perf_counter() - started, attributes)
+
+    def _statement(self, query: str, query_params: dict) -> tuple[str, list]:
+        statement = self._statements.get(query)
+        if statement is not None:
+            self.statement_cache_hits.add(1)
+        else:
+            self.statement_cache_misses.add(1)
+            statement = compile_query(query)
+
+            if len(self._statements) >= self.statement_cache_size:
+                self._statements.pop(next(iter(self._statements)))
+            self._statements[query] = statement
+
+        sql, names = statement
+        return sql, [query_params[name] for name in names]
+
+    def in_transaction(self) -> bool:
+        return self._transaction_connection.get() is not None
+
+    def primary_pinned(self) -> bool:
+        # Реплик нет: все чтения и так идут в primary
+        return False
+
+    @asynccontextmanager
+    async def primary(self) -> AsyncIterator[None]:
+        yield
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        if self._transaction_connection.get() is not None:
+            # Вложенный вызов присоединяется к уже открытой транзакции
+            yield
+            return
+
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                token = self._transaction_connection.set(conn)
+                try:
+                    yield
+                finally:
+                    self._transaction_connection.reset(token)
+
+    async def _executor(self) -> asyncpg.Pool | asyncpg.Connection:
+        conn = self._transaction_connection.get()
+        if conn is not None:
+            return conn
+        return await self._pool()
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[asyncpg.Connection]:
+        conn = self._transaction_connection.get()
+        if conn is not None:
+            yield conn
+            return
+
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                yield conn
+
+    async def insert(self, query: str, query_params: dict, query_name: str = "unnamed") -> int:
+        sql, args = self._statement(query, query_params)
+        executor = await self._executor()
+        async with self._observe(query_name, "insert"):
+            return await executor.fetchval(sql, *args, timeout=self._timeout(query_name))
+
+    async def bulk_insert(
+            self,
+            table: str,
+            columns: list[str],
+            records: list[tuple],
+            id_column: str = "id",
+            query_name: str = "unnamed"
+    ) -> list[int]:
+        if not records:
+            return []
+
+        sql, args = self._statement(
+            reserve_ids_query,
+            {"table": table, "id_column": id_column, "count": len(records)}
+        )
+        async with self._connection() as conn:
+            async with self._observe(query_name, "copy"):
+                ids = [row[0] for row in await conn.fetch(sql, *args)]
+                await conn.copy_records_to_table(
+                    table,
+                    columns=[id_column, *columns],
+                    records=[(record_id, *record) for record_id, record in zip(ids, records)],
+                    timeout=self._timeout(query_name)
+                )
+
+        return ids
+
+    async def delete(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]:
+        sql, args = self._statement(query, query_params)
+        executor = await self._executor()
+        async with self._observe(query_name, "delete"):
+            return await executor.fetch(sql, *args, timeout=self._timeout(query_name))
+
+    async def update(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]:
+        sql, args = self._statement(query, query_params)
+        executor = await self._executor()
+        async with self._observe(query_name, "update"):
+            return await executor.fetch(sql, *args, timeout=self._timeout(query_name))
+
+    async def select(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]:
+        sql, args = self._statement(query, query_params)
+        executor = await self._executor()
+        async with self._observe(query_name, "select"):
+            return await executor.fetch(sql, *args, timeout=self._timeout(query_name))
+
+    async def stream(
+            self,
+            query: str,
+            query_params: dict,
+            batch_size: int = 500,
+            query_name: str = "unnamed"
+    ) -> AsyncIterator[Sequence[Any]]:
+        sql, args = self._statement(query, query_params)
+        timeout = self._timeout(query_name)
+        # Span не открываем: генератор дочитывается уже после выхода из обработчика
+        attributes = {"db.query.name": query_name, "db.operation.name": "stream"}
+        started = time.perf_counter()
+        try:
+            # Курсор asyncpg существует только внутри транзакции
+            async with self._connection() as conn:
+                cursor = await conn.cursor(sql, *args, timeout=timeout)
+                while rows := await cursor.fetch(batch_size, timeout=timeout):
+                    yield rows
+        finally:
+            self.query_duration.record(time.perf_counter() - started, attributes)
+
+    async def multi_query(
+            self,
+            queries: list[str],
+            query_name: str = "unnamed"
+    ) -> None:
+        async with self._connection() as conn:
+            async with self._observe(query_name, "multi_query"):
+                # DDL и миграции переписывают таблицы целиком — общий таймаут на них не распространяется
+                if self.statement_timeout:
+                    await conn.execute("SET LOCAL statement_timeout = 0")
+                for query in queries:
+                    await conn.execute(query)
+                if self.statement_timeout and self._transaction_connection.get() is conn:
+                    await conn.execute(f"SET LOCAL statement_timeout = {int(self.statement_timeout)}")
+        return None
+
+    async def autocommit_query(
+            self,
+            queries: list[str],
+            query_name: str = "unnamed"
+    ) -> None:
+        # Каждый запрос фиксируется сам: CREATE/DROP INDEX CONCURRENTLY нельзя выполнить внутри транзакции
+        pool = await self._pool()
+        async with pool.acquire() as conn:
+            async with self._observe(query_name, "autocommit_query"):
+                if self.statement_timeout:
+                    await conn.execute("SET statement_timeout = 0")
+                try:
+                    for query in queries:
+                        await conn.execute(query)
+                finally:
+                    if self.statement_timeout:
+                        # Соединение вернётся в пул — таймаут по умолчанию восстанавливается
+                        await conn.execute("RESET statement_timeout")
+        return None
@@ -1,11 +1,34 @@
 import redis.asyncio as aioredis
 from redis.connection import ConnectionPool
-from typing import Any
+from typing import Any, AsyncIterator
 import json
 import asyncio
 
 from internal import interface
 
+# Пары KEYS: ключ и его счётчик поколений; ARGV: ttl, затем значение и ожидаемое поколение для каждой пары
+_set_many_if_script = """
+for i = 1, #KEYS, 2 do
+    if (redis.call('GET', KEYS[i + 1]) or '') == ARGV[i + 2] then
+        if tonumber(ARGV[1]) > 0 then
+            redis.call('SET', KEYS[i], ARGV[i + 1], 'EX', ARGV[1])
+        else
+            redis.call('SET', KEYS[i], ARGV[i + 1])
+        end
+    end
+end
+"""
+
+# KEYS: хэш и счётчик поколений; ARGV: поле, значение, ожидаемое поколение, ttl
+_hset_if_script = """
+if (redis.call('GET', KEYS[2]) or '') == ARGV[3] then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    if tonumber(ARGV[4]) > 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[4])
+    end
+end
+"""
+
 
 class RedisClient(interface.IRedis):
     def __init__(
@@ -57,6 +80,106 @@ class RedisClient(interface.IRedis):
         except Exception as e:
             return default
 
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        client = await self.get_async_client()
+        return await client.delete(*keys)
+
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        if not keys:
+            return []
+        client = await self.get_async_client()
+        values = await client.mget(keys)
+        return [None if value is None else self._deserialize_value(value) for value in values]
+
+    async def set_many(self, values: dict[str, Any], ttl: int = None) -> None:
+        if not values:
+            return
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                serialized_value = self._serialize_value(value)
+                if ttl:
+                    pipe.setex(key, ttl, serialized_value)
+                else:
+                    pipe.set(key, serialized_value)
+            await pipe.execute()
+
+    async def set_many_if(
+            self,
+            values: dict[str, Any],
+            guards: dict[str, tuple[str, Any]],
+            ttl: int = None
+    ) -> None:
+        # Значение пишется, только если счётчик guards[key] не изменился с момента чтения
+        if not values:
+            return
+        client = await self.get_async_client()
+        keys: list[str] = []
+        args: list[Any] = [ttl or 0]
+        for key, value in values.items():
+            guard_key, expected = guards[key]
+            keys += [key, guard_key]
+            args += [self._serialize_value(value), self._serialize_generation(expected)]
+        await client.eval(_set_many_if_script, len(keys), *keys, *args)
+
+    async def hget(self, key: str, field: str) -> Any:
+        client = await self.get_async_client()
+        value = await client.hget(key, field)
+        return None if value is None else self._deserialize_value(value)
+
+    async def hset(self, key: str, field: str, value: Any, ttl: int = None) -> None:
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, field, self._serialize_value(value))
+            if ttl:
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def hset_if(
+            self,
+            key: str,
+            field: str,
+            value: Any,
+            guard: tuple[str, Any],
+            ttl: int = None
+    ) -> None:
+        client = await self.get_async_client()
+        guard_key, expected = guard
+        await client.eval(
+            _hset_if_script, 2, key, guard_key,
+            field, self._serialize_value(value), self._serialize_generation(expected), ttl or 0
+        )
+
+    async def invalidate(self, keys: list[str], generation_keys: list[str], generation_ttl: int = None) -> None:
+        # Поколения растут в той же транзакции MULTI, что и удаление ключей
+        if not keys and not generation_keys:
+            return
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=True) as pipe:
+            for generation_key in generation_keys:
+                pipe.incr(generation_key)
+                if generation_ttl:
+                    pipe.expire(generation_key, generation_ttl)
+            if keys:
+                pipe.delete(*keys)
+            await pipe.execute()
+
+    async def publish(self, channel: str, message: Any) -> int:
+        client = await self.get_async_client()
+        return await client.publish(channel, self._serialize_value(message))
+
+    async def listen(self, channel: str) -> AsyncIterator[Any]:
+        client = await self.get_async_client()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                yield self._deserialize_value(message["data"])
+        finally:
+            await pubsub.aclose()
+
     async def get_async_client(self) -> aioredis.Redis:
         if self.async_client is None:
             self.async_pool = aioredis.ConnectionPool.from_url(
@@ -72,6 +195,10 @@ class RedisClient(interface.IRedis):
             return value
         return json.dumps(value, default=str, ensure_ascii=False)
 
+    def _serialize_generation(self, generation: Any) -> str:
+        # Отсутствующий счётчик сравнивается со скриптом как пустая строка
+        return "" if generation is None else str(generation)
+
     def _deserialize_value(self, value: str) -> Any:
         if not isinstance(value, str):
             return value
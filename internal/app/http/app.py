@@ -1,11 +1,15 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from internal import model, interface
+from internal.controller.http.response.response import FastJSONResponse
 from internal.controller.http.handler.employee.model import *
 
 
 def NewHTTP(
         db: interface.IDB,
+        employee_repo: interface.IEmployeeRepo,
         employee_controller: interface.IEmployeeController,
         http_middleware: interface.IHttpMiddleware,
         prefix: str,
@@ -18,6 +22,8 @@ def NewHTTP(
         openapi_url=prefix + "/openapi.json",
         docs_url=prefix + "/docs",
         redoc_url=prefix + "/redoc",
+        lifespan=new_lifespan(employee_repo),
+        default_response_class=FastJSONResponse,
     )
     include_middleware(app, http_middleware)
     include_db_handler(app, db, prefix, environment)
@@ -26,10 +32,22 @@ def NewHTTP(
     return app
 
 
+def new_lifespan(employee_repo: interface.IEmployeeRepo):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Подписка на инвалидации кэша от других реплик живёт вместе с приложением
+        await employee_repo.start_invalidation_listener()
+        yield
+        await employee_repo.stop_invalidation_listener()
+
+    return lifespan
+
+
 def include_middleware(
         app: FastAPI,
         http_middleware: interface.IHttpMiddleware,
 ):
+    http_middleware.compression_middleware04(app)
     http_middleware.authorization_middleware03(app)
     http_middleware.logger_middleware02(app)
     http_middleware.trace_middleware01(app)
@@ -51,14 +69,28 @@ def include_employee_handlers(
         description="Создает нового сотрудника в организации"
     )
 
+    # Массовое создание сотрудников
+    app.add_api_route(
+        prefix + "/bulk-create",
+        employee_controller.create_employees,
+        methods=["POST"],
+        tags=["Employee"],
+        response_model=BulkCreateEmployeesResponse,
+        summary="Массово создать сотрудников",
+        description="Создает список сотрудников организации одним запросом"
+    )
+
     app.add_api_route(
         prefix + "/account/{account_id}",
         employee_controller.get_employee_by_account_id,
         methods=["GET"],
         tags=["Employee"],
-        response_model=model.Employee,
+        response_model=list[EmployeeResponse],
         summary="Получить сотрудника по account ID",
-        description="Возвращает информацию о сотруднике по account_id идентификатору"
+        description=(
+            "Возвращает информацию о сотруднике по account_id идентификатору; "
+            "с ?fields=a,b в каждом объекте только перечисленные поля"
+        )
     )
 
     # Получение сотрудников по организации
@@ -67,9 +99,20 @@ def include_employee_handlers(
         employee_controller.get_employees_by_organization,
         methods=["GET"],
         tags=["Employee"],
-        response_model=list[model.Employee],
+        response_model=GetEmployeesByOrganizationResponse,
         summary="Получить сотрудников организации",
-        description="Возвращает список всех сотрудников указанной организации"
+        description="Возвращает страницу сотрудников организации; следующая страница запрашивается по next_cursor; с db_json=true весь список отдаётся потоком JSON, собранного Postgres"
+    )
+
+    # Агрегаты по сотрудникам организации
+    app.add_api_route(
+        prefix + "/organization/{organization_id}/aggregates",
+        employee_controller.get_employee_aggregates_by_organization,
+        methods=["GET"],
+        tags=["Employee"],
+        response_model=GetEmployeeAggregatesResponse,
+        summary="Получить агрегаты сотрудников организации",
+        description="Возвращает количество сотрудников организации по ролям и по правам"
     )
 
     # Обновление прав сотрудника
@@ -92,6 +135,28 @@ def include_employee_handlers(
         description="Обновляет роль сотрудника в организации"
     )
 
+    # Проверка одного права с поддержкой If-None-Match
+    app.add_api_route(
+        prefix + "/account/{account_id}/permissions/{permission_type}",
+        employee_controller.check_employee_permission,
+        methods=["GET"],
+        tags=["Employee"],
+        response_model=CheckEmployeePermissionResponse,
+        summary="Проверить право сотрудника",
+        description="Возвращает решение по одному праву; при совпадении If-None-Match с ETag отвечает 304"
+    )
+
+    # Пакетная проверка прав для других сервисов
+    app.add_api_route(
+        prefix + "/permissions/check-batch",
+        employee_controller.check_employee_permissions,
+        methods=["POST"],
+        tags=["Employee"],
+        response_model=CheckEmployeePermissionsResponse,
+        summary="Проверить права сотрудников",
+        description="Проверяет список пар (account_id, право) одним запросом и возвращает карту решений"
+    )
+
     # Удаление сотрудника
     app.add_api_route(
         prefix + "/{account_id}",
@@ -137,7 +202,7 @@ def heath_check_handler():
 def create_table_handler(db: interface.IDB):
     async def create_table():
         try:
-            await db.multi_query(model.create_organization_tables_queries)
+            await db.multi_query(model.create_organization_tables_queries, query_name="create_tables")
             return {"message": "Tables created successfully"}
         except Exception as err:
             raise err
@@ -150,7 +215,7 @@ def drop_table_handler(db: interface.IDB, environment: str):
         if environment == "prod":
             return {"message": "Tables not dropped in production"}
         try:
-            await db.multi_query(model.drop_queries)
+            await db.multi_query(model.drop_queries, query_name="drop_tables")
             return {"message": "Tables dropped successfully"}
         except Exception as err:
             raise err
@@ -8,3 +8,15 @@ class ErrInsufficientPermissions(Exception):
     def __init__(self, message="Insufficient permissions"):
         self.message = message
         super().__init__(self.message)
+
+
+class ErrInvalidCursor(Exception):
+    def __init__(self, message="Invalid pagination cursor"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ErrUnknownFields(Exception):
+    def __init__(self, message="Unknown employee fields"):
+        self.message = message
+        super().__init__(self.message)
@@ -15,11 +15,82 @@ class Config:
         self.interserver_secret_key = os.getenv("LOOM_INTERSERVER_SECRET_KEY")
 
         # Database configuration
+        # sqlalchemy — PG поверх AsyncSession, asyncpg — RawPG напрямую поверх asyncpg.Pool
+        self.db_driver = os.getenv("LOOM_EMPLOYEE_DB_DRIVER", "sqlalchemy")
         self.db_host = os.getenv("LOOM_EMPLOYEE_POSTGRES_CONTAINER_NAME", "localhost")
         self.db_port = "5432"
         self.db_name = os.getenv("LOOM_EMPLOYEE_POSTGRES_DB_NAME", "hr_interview")
         self.db_user = os.getenv("LOOM_EMPLOYEE_POSTGRES_USER", "postgres")
         self.db_pass = os.getenv("LOOM_EMPLOYEE_POSTGRES_PASSWORD", "password")
+        self.db_pool_size = int(os.getenv("LOOM_EMPLOYEE_DB_POOL_SIZE", "15"))
+        self.db_max_overflow = int(os.getenv("LOOM_EMPLOYEE_DB_MAX_OVERFLOW", "15"))
+        self.db_pool_recycle = int(os.getenv("LOOM_EMPLOYEE_DB_POOL_RECYCLE", "300"))
+        self.db_pool_pre_ping = os.getenv("LOOM_EMPLOYEE_DB_POOL_PRE_PING", "false").lower() == "true"
+        self.db_pool_timeout = float(os.getenv("LOOM_EMPLOYEE_DB_POOL_TIMEOUT", "30"))
+
+        # Реплики для чтения: "host" или "host:port" через запятую
+        self.db_replica_hosts = [
+            host.strip()
+            for host in os.getenv("LOOM_EMPLOYEE_POSTGRES_REPLICA_HOSTS", "").split(",")
+            if host.strip()
+        ]
+        self.db_read_pool_size = int(os.getenv("LOOM_EMPLOYEE_DB_READ_POOL_SIZE", "15"))
+        self.db_read_max_overflow = int(os.getenv("LOOM_EMPLOYEE_DB_READ_MAX_OVERFLOW", "15"))
+        self.db_replica_max_lag = float(os.getenv("LOOM_EMPLOYEE_DB_REPLICA_MAX_LAG", "5"))
+        self.db_replica_check_interval = float(os.getenv("LOOM_EMPLOYEE_DB_REPLICA_CHECK_INTERVAL", "5"))
+
+        # Таймауты запросов в мс: общий и по именам запросов ("name=ms,name=ms")
+        self.db_statement_timeout = int(os.getenv("LOOM_EMPLOYEE_DB_STATEMENT_TIMEOUT", "30000"))
+        self.db_statement_timeouts = {
+            name.strip(): int(timeout)
+            for name, _, timeout in (
+                item.partition("=")
+                for item in os.getenv(
+                    "LOOM_EMPLOYEE_DB_STATEMENT_TIMEOUTS",
+                    "get_employee_by_account_id=1000,"
+                    "get_employees_by_account_ids=1000,"
+                    "get_employees_by_organization=1000,"
+                    "get_employees_by_organization_after=1000,"
+                    "get_employee_aggregates_by_organization=1000,"
+                    "get_employees_json_page_by_organization=1000,"
+                    "get_employees_json_page_by_organization_after=1000"
+                ).split(",")
+                if item.strip()
+            )
+        }
+        # Размер пула на каждый отличный от общего таймаут, у primary и у каждой реплики. Соединений
+        # на процесс не больше: основные пулы + число таймаутов × (1 + число реплик) × (size + overflow)
+        self.db_timeout_pool_size = int(os.getenv("LOOM_EMPLOYEE_DB_TIMEOUT_POOL_SIZE", "5"))
+        self.db_timeout_max_overflow = int(os.getenv("LOOM_EMPLOYEE_DB_TIMEOUT_MAX_OVERFLOW", "5"))
+
+        self.db_statement_cache_size = int(os.getenv("LOOM_EMPLOYEE_DB_STATEMENT_CACHE_SIZE", "256"))
+        self.db_prepared_statement_cache_size = int(
+            os.getenv("LOOM_EMPLOYEE_DB_PREPARED_STATEMENT_CACHE_SIZE", "100")
+        )
+
+        # Размер страницы списка сотрудников организации
+        self.employee_page_size = int(os.getenv("LOOM_EMPLOYEE_PAGE_SIZE", "50"))
+        self.employee_max_page_size = int(os.getenv("LOOM_EMPLOYEE_MAX_PAGE_SIZE", "200"))
+
+        # Сжатие HTTP-ответов (gzip): минимальный размер тела, уровень zlib и размер,
+        # начиная с которого сжатие уходит в поток
+        self.http_compression_min_size = int(os.getenv("LOOM_EMPLOYEE_HTTP_COMPRESSION_MIN_SIZE", "1024"))
+        self.http_compression_level = int(os.getenv("LOOM_EMPLOYEE_HTTP_COMPRESSION_LEVEL", "1"))
+        self.http_compression_offload_size = int(
+            os.getenv("LOOM_EMPLOYEE_HTTP_COMPRESSION_OFFLOAD_SIZE", "262144")
+        )
+
+        # Кэш прав сотрудников в памяти процесса
+        self.permission_cache_size = int(os.getenv("LOOM_EMPLOYEE_PERMISSION_CACHE_SIZE", "10000"))
+        self.permission_cache_ttl = float(os.getenv("LOOM_EMPLOYEE_PERMISSION_CACHE_TTL", "30"))
+
+        # Общий кэш сотрудников в Redis с инвалидацией через pub/sub
+        self.employee_cache_enabled = os.getenv("LOOM_EMPLOYEE_CACHE_ENABLED", "false").lower() == "true"
+        self.employee_cache_ttl = int(os.getenv("LOOM_EMPLOYEE_CACHE_TTL", "60"))
+        self.employee_redis_host = os.getenv("LOOM_EMPLOYEE_REDIS_CONTAINER_NAME", "localhost")
+        self.employee_redis_port = int(os.getenv("LOOM_EMPLOYEE_REDIS_PORT", "6379"))
+        self.employee_redis_db = int(os.getenv("LOOM_EMPLOYEE_REDIS_DB", "0"))
+        self.employee_redis_password = os.getenv("LOOM_EMPLOYEE_REDIS_PASSWORD", "")
 
         # Настройки телеметрии
         self.alert_tg_bot_token = os.getenv("LOOM_ALERT_TG_BOT_TOKEN", "")
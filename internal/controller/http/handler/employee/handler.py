@@ -1,10 +1,14 @@
+from typing import Any, AsyncIterator
+
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from internal import interface
+from internal import interface, model, common
 from internal.controller.http.handler.employee.model import (
-    CreateEmployeeBody, UpdateEmployeePermissionsBody, UpdateEmployeeRoleBody
+    CreateEmployeeBody, BulkCreateEmployeesBody, UpdateEmployeePermissionsBody, UpdateEmployeeRoleBody,
+    CheckEmployeePermissionsBody
 )
+from internal.controller.http.response.response import FastJSONResponse, dumps
 from pkg.log_wrapper import auto_log
 
 from pkg.trace_wrapper import traced_method
@@ -35,28 +39,148 @@ class EmployeeController(interface.IEmployeeController):
             role=body.role
         )
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=201,
             content={"employee_id": employee_id}
         )
 
     @auto_log()
     @traced_method()
-    async def get_employee_by_account_id(self, request: Request, account_id: int) -> JSONResponse:
+    async def create_employees(
+            self,
+            request: Request,
+            body: BulkCreateEmployeesBody
+    ) -> JSONResponse:
+        employee_ids = await self.employee_service.create_employees(
+            organization_id=body.organization_id,
+            invited_from_account_id=body.invited_from_account_id,
+            employees=[employee.model_dump(mode="json") for employee in body.employees]
+        )
+
+        return FastJSONResponse(
+            status_code=201,
+            content={"employee_ids": employee_ids}
+        )
+
+    @auto_log()
+    @traced_method()
+    async def get_employee_by_account_id(
+            self,
+            request: Request,
+            account_id: int,
+            fields: str | None = None
+    ) -> JSONResponse:
+        try:
+            selected_fields = _parse_fields(fields)
+        except common.ErrUnknownFields as err:
+            return FastJSONResponse(status_code=400, content={"error": err.message})
+
+        # Запись берётся из общей пачки/кэша целиком, поэтому проекция применяется при сериализации
         employee = await self.employee_service.get_employee_by_account_id(account_id)
-        return JSONResponse(
+
+        headers = None
+        versions = [employee.version for employee in employee]
+        if versions and None not in versions:
+            # Версия поднимается при каждой записи сотрудника: совпал ETag — тело не сериализуется
+            headers = _etag_headers(f'"employee-{"-".join(map(str, versions))}"')
+            if _etag_matches(request, headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+
+        return FastJSONResponse(
             status_code=200,
-            content=[employee.to_dict() for employee in employee]
+            content=[employee.to_dict(selected_fields) for employee in employee],
+            headers=headers
         )
 
     @auto_log()
     @traced_method()
-    async def get_employees_by_organization(self, request: Request, organization_id: int) -> JSONResponse:
-        employees = await self.employee_service.get_employees_by_organization(organization_id)
+    async def get_employees_by_organization(
+            self,
+            request: Request,
+            organization_id: int,
+            limit: int | None = None,
+            cursor: str | None = None,
+            fields: str | None = None,
+            stream: bool = False,
+            db_json: bool = False
+    ) -> Response:
+        try:
+            selected_fields = _parse_fields(fields)
+        except common.ErrUnknownFields as err:
+            return FastJSONResponse(status_code=400, content={"error": err.message})
+
+        if db_json and selected_fields is not None:
+            # Форму JSON задаёт запрос в Postgres, проекция к нему не применяется
+            return FastJSONResponse(status_code=400, content={"error": "fields is not supported with db_json"})
+
+        # Версия организации поднимается в транзакции любой записи её сотрудников. Параметры запроса
+        # входят в URL, поэтому одной версии достаточно для всех вариантов ответа
+        if request.headers.get("if-none-match"):
+            # Текущая версия берётся из кэша или primary: совпавший ETag отвечает 304, не читая строки
+            version = await self.employee_service.get_organization_version(organization_id)
+            if version is not None:
+                headers = _organization_etag_headers(organization_id, version)
+                if _etag_matches(request, headers["ETag"]):
+                    return Response(status_code=304, headers=headers)
+
+        # Для ответа 200 ETag строится из версии, прочитанной одним оператором со строками, — она
+        # не новее отданных сотрудников. Потоки читают первую пачку до заголовков ради этой версии
+        if db_json:
+            # JSON сотрудников собирает Postgres, байты страниц передаются в ответ без разбора
+            pages = self.employee_service.stream_employees_json_by_organization(organization_id)
+            first_page = await anext(pages, None)
+            return StreamingResponse(
+                self._stream_employees_json_by_organization(first_page, pages),
+                status_code=200,
+                media_type="application/json",
+                headers=_organization_etag_headers(organization_id, first_page and first_page[1])
+            )
 
-        return JSONResponse(
+        if stream:
+            # Сотрудники отдаются пачками по мере чтения курсора, без сборки всего списка в памяти
+            batches = self.employee_service.stream_employees_by_organization(organization_id)
+            first_batch = await anext(batches, None)
+            return StreamingResponse(
+                self._stream_employees_by_organization(first_batch, batches, selected_fields),
+                status_code=200,
+                media_type="application/json",
+                headers=_organization_etag_headers(organization_id, first_batch and first_batch[1])
+            )
+
+        try:
+            if selected_fields is not None:
+                # Выбранные колонки доходят до SQL, объекты Employee не создаются
+                employees, next_cursor, version = await self.employee_service.get_employee_fields_by_organization(
+                    organization_id, selected_fields, limit, cursor
+                )
+            else:
+                employees, next_cursor, version = await self.employee_service.get_employees_by_organization(
+                    organization_id, limit, cursor
+                )
+        except common.ErrInvalidCursor as err:
+            return FastJSONResponse(status_code=400, content={"error": err.message})
+
+        return FastJSONResponse(
             status_code=200,
-            content={"employees": [emp.to_dict() for emp in employees]}
+            content={
+                "employees": employees,
+                "next_cursor": next_cursor
+            },
+            headers=_organization_etag_headers(organization_id, version)
+        )
+
+    @auto_log()
+    @traced_method()
+    async def get_employee_aggregates_by_organization(
+            self,
+            request: Request,
+            organization_id: int
+    ) -> JSONResponse:
+        aggregates = await self.employee_service.get_employee_aggregates_by_organization(organization_id)
+
+        return FastJSONResponse(
+            status_code=200,
+            content=aggregates
         )
 
     @auto_log()
@@ -78,7 +202,7 @@ class EmployeeController(interface.IEmployeeController):
             setting_organization_permission=body.setting_organization_permission
         )
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=200,
             content={}
         )
@@ -94,7 +218,7 @@ class EmployeeController(interface.IEmployeeController):
             account_id=body.account_id,
             role=body.role
         )
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=200,
             content={}
         )
@@ -104,7 +228,128 @@ class EmployeeController(interface.IEmployeeController):
     async def delete_employee(self, request: Request, account_id: int) -> JSONResponse:
         await self.employee_service.delete_employee(account_id)
 
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=200,
             content={}
         )
+
+    @auto_log()
+    @traced_method()
+    async def check_employee_permission(
+            self,
+            request: Request,
+            account_id: int,
+            permission_type: str
+    ) -> Response:
+        try:
+            snapshot = await self.employee_service.get_permission_snapshot(account_id)
+        except common.ErrEmployeeNotFound:
+            return FastJSONResponse(status_code=404, content={"allowed": False})
+
+        # ETag зависит только от роли и маски прав: пока они не менялись, опрашивающим отдаётся 304 без тела
+        headers = _etag_headers(f'"{snapshot.version}"')
+        if _etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        return FastJSONResponse(
+            status_code=200,
+            content={"allowed": snapshot.allows(permission_type)},
+            headers=headers
+        )
+
+    @auto_log()
+    @traced_method()
+    async def check_employee_permissions(
+            self,
+            request: Request,
+            body: CheckEmployeePermissionsBody
+    ) -> JSONResponse:
+        decisions = await self.employee_service.check_employee_permissions(
+            [(check.account_id, check.permission_type) for check in body.checks]
+        )
+
+        return FastJSONResponse(
+            status_code=200,
+            content={"decisions": decisions}
+        )
+
+    @staticmethod
+    async def _stream_employees_by_organization(
+            first_batch: tuple[list[model.Employee], int | None] | None,
+            batches: AsyncIterator[tuple[list[model.Employee], int | None]],
+            fields: list[str] | None
+    ) -> AsyncIterator[bytes]:
+        yield b'{"employees":['
+
+        separator = b""
+        if first_batch is not None:
+            async for employees, _ in _chain(first_batch, batches):
+                if not employees:
+                    continue
+                if fields is not None:
+                    employees = [employee.to_dict(fields) for employee in employees]
+                # Пачка кодируется массивом целиком, скобки срезаются, чтобы склеить пачки в один список
+                yield separator + dumps(employees)[1:-1]
+                separator = b","
+
+        yield b"]}"
+
+    @staticmethod
+    async def _stream_employees_json_by_organization(
+            first_page: tuple[bytes, int | None] | None,
+            pages: AsyncIterator[tuple[bytes, int | None]]
+    ) -> AsyncIterator[bytes]:
+        yield b'{"employees":['
+
+        separator = b""
+        if first_page is not None:
+            async for page, _ in _chain(first_page, pages):
+                yield separator + page
+                separator = b","
+
+        yield b"]}"
+
+
+async def _chain(first: Any, rest: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    # Первый элемент потока прочитан до отправки заголовков — возвращаем его на место
+    yield first
+    async for item in rest:
+        yield item
+
+
+def _parse_fields(fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+
+    selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in model.employee_fields]
+    if unknown:
+        raise common.ErrUnknownFields(f"Unknown employee fields: {', '.join(unknown)}")
+
+    return selected or None
+
+
+def _organization_etag_headers(organization_id: int, version: int | None) -> dict[str, str] | None:
+    # Без версии (пустой список) ответ отдаётся без ETag
+    if version is None:
+        return None
+
+    return _etag_headers(f'"organization-{organization_id}-{version}"')
+
+
+def _etag_headers(etag: str) -> dict[str, str]:
+    # no-cache: клиент хранит ответ, но каждый раз перепроверяет его через If-None-Match
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # Слабое сравнение (RFC 9110): префикс W/ не учитывается
+    candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
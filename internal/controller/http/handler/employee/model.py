@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field
 from internal.model.employee import EmployeeRole
 
 
@@ -10,6 +12,20 @@ class CreateEmployeeBody(BaseModel):
     role: str
 
 
+class BulkEmployeeItem(BaseModel):
+    account_id: int
+    name: str
+    # COPY пишет роль без проверок: неизвестное значение потом ломало бы чтение сотрудника
+    role: EmployeeRole
+
+
+class BulkCreateEmployeesBody(BaseModel):
+    organization_id: int
+    invited_from_account_id: int
+    # Импорт рассчитан на 50k строк за запрос; больший список — частями
+    employees: list[BulkEmployeeItem] = Field(max_length=50000)
+
+
 class UpdateEmployeePermissionsBody(BaseModel):
     account_id: int
     required_moderation: bool = None
@@ -26,14 +42,65 @@ class UpdateEmployeeRoleBody(BaseModel):
     account_id: int
     role: EmployeeRole
 
+
+class PermissionCheckItem(BaseModel):
+    account_id: int
+    permission_type: str
+
+
+class CheckEmployeePermissionsBody(BaseModel):
+    checks: list[PermissionCheckItem] = Field(max_length=1000)
+
 # Response models
 class CreateEmployeeResponse(BaseModel):
     employee_id: int
 
 
+class BulkCreateEmployeesResponse(BaseModel):
+    employee_ids: list[int]
+
+
+class CheckEmployeePermissionResponse(BaseModel):
+    allowed: bool
+
+
+class CheckEmployeePermissionsResponse(BaseModel):
+    # account_id -> permission_type -> решение
+    decisions: dict[int, dict[str, bool]]
+
+
 class GetEmployeeResponse(BaseModel):
     employee: dict
 
 
+# Форма model.Employee.to_dict(): маска прав раскрыта в отдельные флаги.
+# С ?fields= в ответе только выбранные поля, поэтому ни одно поле не обязательно
+class EmployeeResponse(BaseModel):
+    id: int | None = None
+    organization_id: int | None = None
+    invited_from_account_id: int | None = None
+    account_id: int | None = None
+    required_moderation: bool | None = None
+    autoposting_permission: bool | None = None
+    add_employee_permission: bool | None = None
+    edit_employee_perm_permission: bool | None = None
+    top_up_balance_permission: bool | None = None
+    sign_up_social_net_permission: bool | None = None
+    setting_category_permission: bool | None = None
+    setting_organization_permission: bool | None = None
+    name: str | None = None
+    role: EmployeeRole | None = None
+    created_at: datetime | None = None
+
+
 class GetEmployeesByOrganizationResponse(BaseModel):
     employees: list[dict]
+    # None — страница последняя
+    next_cursor: str | None = None
+
+
+class GetEmployeeAggregatesResponse(BaseModel):
+    organization_id: int
+    total: int
+    roles: dict[str, int]
+    permissions: dict[str, int]
@@ -1,5 +1,7 @@
+import asyncio
+import zlib
 from contextvars import ContextVar
-from typing import Callable
+from typing import AsyncIterator, Callable
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
@@ -17,6 +19,9 @@ class HttpMiddleware(interface.IHttpMiddleware):
             loom_authorization_client: interface.ILoomAuthorizationClient,
             prefix: str,
             log_context: ContextVar[dict],
+            compression_min_size: int = 1024,
+            compression_level: int = 1,
+            compression_offload_size: int = 262144,
     ):
         self.tracer = tel.tracer()
         self.meter = tel.meter()
@@ -25,6 +30,12 @@ class HttpMiddleware(interface.IHttpMiddleware):
         self.loom_authorization_client = loom_authorization_client
         self.log_context = log_context
 
+        # Ответы короче compression_min_size не сжимаются; тела от compression_offload_size
+        # сжимаются в потоке, чтобы не держать event loop
+        self.compression_min_size = compression_min_size
+        self.compression_level = compression_level
+        self.compression_offload_size = compression_offload_size
+
     def trace_middleware01(self, app: FastAPI):
         @app.middleware("http")
         async def _trace_middleware01(request: Request, call_next: Callable):
@@ -134,3 +145,103 @@ class HttpMiddleware(interface.IHttpMiddleware):
                     raise e
 
         return _authorization_middleware03
+
+    def compression_middleware04(self, app: FastAPI):
+        @app.middleware("http")
+        async def _compression_middleware04(request: Request, call_next: Callable):
+            response = await call_next(request)
+
+            if "content-encoding" in response.headers or not _is_compressible(response):
+                return response
+
+            # Представление зависит от Accept-Encoding — кэши должны это учитывать. ETag слабый
+            # для любого кодирования: сжатое тело не совпадает побайтово с несжатым, а 304 и 200
+            # отдают один и тот же валидатор
+            _add_vary(response, "Accept-Encoding")
+            etag = response.headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                response.headers["etag"] = "W/" + etag
+
+            if response.status_code == 304 or not _accepts_gzip(request.headers.get("accept-encoding", "")):
+                return response
+
+            content_length = response.headers.get("content-length")
+            if content_length is None:
+                # Потоковый ответ: размер неизвестен, пачки сжимаются по мере отдачи
+                response.body_iterator = self._gzip_stream(response.body_iterator)
+            else:
+                if int(content_length) < self.compression_min_size:
+                    return response
+
+                body = b"".join([chunk async for chunk in response.body_iterator])
+                body = await self._gzip(body)
+                response.body_iterator = _iterate(body)
+                response.headers["content-length"] = str(len(body))
+
+            response.headers["content-encoding"] = "gzip"
+            return response
+
+        return _compression_middleware04
+
+    async def _gzip(self, body: bytes) -> bytes:
+        if len(body) < self.compression_offload_size:
+            return zlib.compress(body, self.compression_level, wbits=31)
+        # zlib отпускает GIL на время сжатия, поэтому поток действительно разгружает event loop
+        return await asyncio.to_thread(zlib.compress, body, self.compression_level, 31)
+
+    async def _gzip_stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(self.compression_level, wbits=31)
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if len(chunk) < self.compression_offload_size:
+                yield _compress_chunk(compressor, chunk)
+            else:
+                yield await asyncio.to_thread(_compress_chunk, compressor, chunk)
+        yield compressor.flush()
+
+
+_compressible_types = ("application/json", "text/")
+
+
+def _is_compressible(response) -> bool:
+    if response.status_code == 304:
+        return True
+    content_type = response.headers.get("content-type", "")
+    return content_type.startswith(_compressible_types)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    # gzip подходит, если он указан с q > 0 или не указан, но разрешён через *
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _add_vary(response, header: str) -> None:
+    vary = response.headers.get("vary")
+    if not vary:
+        response.headers["vary"] = header
+    elif header.lower() not in (item.strip().lower() for item in vary.split(",")):
+        response.headers["vary"] = f"{vary}, {header}"
+
+
+def _compress_chunk(compressor, chunk: bytes) -> bytes:
+    # Z_SYNC_FLUSH после каждой пачки: клиент разбирает поток, не дожидаясь конца ответа
+    return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+async def _iterate(body: bytes) -> AsyncIterator[bytes]:
+    yield body
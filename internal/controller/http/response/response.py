@@ -0,0 +1,27 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from internal import model
+
+# datetime, Enum и нестроковые ключи orjson кодирует сам; dataclass-ы уходят в _default,
+# чтобы Employee отдавался в форме API, а не полями модели
+_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_options)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, model.Employee):
+        return value.to_encodable_dict()
+    if isinstance(value, model.EmployeeAggregates):
+        return value.to_dict()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
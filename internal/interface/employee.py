@@ -1,12 +1,14 @@
 from abc import abstractmethod
-from typing import Protocol
+from datetime import datetime
+from typing import Protocol, AsyncContextManager, AsyncIterator, Callable
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi import Request
 
 from internal import model
 from internal.controller.http.handler.employee.model import (
-    CreateEmployeeBody, UpdateEmployeePermissionsBody, UpdateEmployeeRoleBody
+    CreateEmployeeBody, BulkCreateEmployeesBody, UpdateEmployeePermissionsBody, UpdateEmployeeRoleBody,
+    CheckEmployeePermissionsBody
 )
 
 
@@ -20,11 +22,41 @@ class IEmployeeController(Protocol):
         pass
 
     @abstractmethod
-    async def get_employee_by_account_id(self, request: Request, account_idd: int) -> JSONResponse:
+    async def create_employees(
+            self,
+            request: Request,
+            body: BulkCreateEmployeesBody
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def get_employee_by_account_id(
+            self,
+            request: Request,
+            account_id: int,
+            fields: str | None = None
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def get_employees_by_organization(
+            self,
+            request: Request,
+            organization_id: int,
+            limit: int | None = None,
+            cursor: str | None = None,
+            fields: str | None = None,
+            stream: bool = False,
+            db_json: bool = False
+    ) -> Response:
         pass
 
     @abstractmethod
-    async def get_employees_by_organization(self, request: Request, organization_id: int) -> JSONResponse:
+    async def get_employee_aggregates_by_organization(
+            self,
+            request: Request,
+            organization_id: int
+    ) -> JSONResponse:
         pass
 
     @abstractmethod
@@ -47,6 +79,23 @@ class IEmployeeController(Protocol):
     async def delete_employee(self, request: Request, account_id: int) -> JSONResponse:
         pass
 
+    @abstractmethod
+    async def check_employee_permission(
+            self,
+            request: Request,
+            account_id: int,
+            permission_type: str
+    ) -> Response:
+        pass
+
+    @abstractmethod
+    async def check_employee_permissions(
+            self,
+            request: Request,
+            body: CheckEmployeePermissionsBody
+    ) -> JSONResponse:
+        pass
+
 
 class IEmployeeService(Protocol):
     @abstractmethod
@@ -60,12 +109,55 @@ class IEmployeeService(Protocol):
     ) -> int:
         pass
 
+    @abstractmethod
+    async def create_employees(
+            self,
+            organization_id: int,
+            invited_from_account_id: int,
+            employees: list[dict]
+    ) -> list[int]:
+        pass
+
     @abstractmethod
     async def get_employee_by_account_id(self, account_id: int) -> list[model.Employee]:
         pass
 
     @abstractmethod
-    async def get_employees_by_organization(self, organization_id: int) -> list[model.Employee]:
+    async def get_employees_by_organization(
+            self,
+            organization_id: int,
+            limit: int | None = None,
+            cursor: str | None = None
+    ) -> tuple[list[model.Employee], str | None, int | None]:
+        pass
+
+    @abstractmethod
+    async def get_employee_fields_by_organization(
+            self,
+            organization_id: int,
+            fields: list[str],
+            limit: int | None = None,
+            cursor: str | None = None
+    ) -> tuple[list[dict], str | None, int | None]:
+        pass
+
+    @abstractmethod
+    async def get_employee_aggregates_by_organization(self, organization_id: int) -> model.EmployeeAggregates:
+        pass
+
+    @abstractmethod
+    async def get_organization_version(self, organization_id: int) -> int | None:
+        pass
+
+    @abstractmethod
+    def stream_employees_by_organization(
+            self,
+            organization_id: int
+    ) -> AsyncIterator[tuple[list[model.Employee], int | None]]:
+        pass
+
+    @abstractmethod
+    def stream_employees_json_by_organization(self, organization_id: int) -> AsyncIterator[tuple[bytes, int | None]]:
         pass
 
     @abstractmethod
@@ -103,8 +195,23 @@ class IEmployeeService(Protocol):
     ) -> bool:
         pass
 
+    @abstractmethod
+    async def check_employee_permissions(
+            self,
+            checks: list[tuple[int, str]]
+    ) -> dict[int, dict[str, bool]]:
+        pass
+
+    @abstractmethod
+    async def get_permission_snapshot(self, account_id: int) -> model.EmployeePermissionSnapshot:
+        pass
+
 
 class IEmployeeRepo(Protocol):
+    @abstractmethod
+    def primary(self) -> AsyncContextManager[None]:
+        pass
+
     @abstractmethod
     async def create_employee(
             self,
@@ -124,12 +231,71 @@ class IEmployeeRepo(Protocol):
     ) -> int:
         pass
 
+    @abstractmethod
+    async def create_employees(self, employees: list[dict]) -> list[int]:
+        pass
+
     @abstractmethod
     async def get_employee_by_account_id(self, account_id: int) -> list[model.Employee]:
         pass
 
     @abstractmethod
-    async def get_employees_by_organization(self, organization_id: int) -> list[model.Employee]:
+    async def get_employees_by_account_ids(self, account_ids: list[int]) -> dict[int, list[model.Employee]]:
+        pass
+
+    @abstractmethod
+    async def get_employees_by_organization(
+            self,
+            organization_id: int,
+            limit: int,
+            after: tuple[datetime, int] | None = None
+    ) -> tuple[list[model.Employee], int | None]:
+        pass
+
+    @abstractmethod
+    async def get_employee_fields_by_organization(
+            self,
+            organization_id: int,
+            fields: list[str],
+            limit: int,
+            after: tuple[datetime, int] | None = None
+    ) -> tuple[list[dict], int | None]:
+        pass
+
+    @abstractmethod
+    async def get_employee_aggregates_by_organization(self, organization_id: int) -> model.EmployeeAggregates:
+        pass
+
+    @abstractmethod
+    async def get_organization_version(self, organization_id: int) -> int | None:
+        pass
+
+    @abstractmethod
+    def stream_employees_by_organization(
+            self,
+            organization_id: int,
+            batch_size: int = 500
+    ) -> AsyncIterator[tuple[list[model.Employee], int | None]]:
+        pass
+
+    @abstractmethod
+    def stream_employees_json_by_organization(
+            self,
+            organization_id: int,
+            page_size: int = 500
+    ) -> AsyncIterator[tuple[bytes, int | None]]:
+        pass
+
+    @abstractmethod
+    def on_invalidate(self, handler: Callable[[list[int] | None], None]) -> None:
+        pass
+
+    @abstractmethod
+    async def start_invalidation_listener(self) -> None:
+        pass
+
+    @abstractmethod
+    async def stop_invalidation_listener(self) -> None:
         pass
 
     @abstractmethod
@@ -144,7 +310,7 @@ class IEmployeeRepo(Protocol):
             sign_up_social_net_permission: bool = None,
             setting_category_permission: bool = None,
             setting_organization_permission: bool = None
-    ) -> None:
+    ) -> int:
         pass
 
     @abstractmethod
@@ -152,9 +318,9 @@ class IEmployeeRepo(Protocol):
             self,
             account_id: int,
             role: model.EmployeeRole
-    ) -> None:
+    ) -> int:
         pass
 
     @abstractmethod
-    async def delete_employee(self, account_id: int) -> None:
+    async def delete_employee(self, account_id: int) -> int:
         pass
\ No newline at end of file
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Protocol, Sequence, Any
+from typing import Protocol, Sequence, Any, AsyncContextManager, AsyncIterator
 
 from fastapi import FastAPI
 
@@ -50,6 +50,9 @@ class IHttpMiddleware(Protocol):
     @abstractmethod
     def authorization_middleware03(self, app: FastAPI): pass
 
+    @abstractmethod
+    def compression_middleware04(self, app: FastAPI): pass
+
 
 class IRedis(Protocol):
     @abstractmethod
@@ -58,21 +61,96 @@ class IRedis(Protocol):
     @abstractmethod
     async def get(self, key: str, default: Any = None) -> Any: pass
 
+    @abstractmethod
+    async def delete(self, *keys: str) -> int: pass
+
+    @abstractmethod
+    async def get_many(self, keys: list[str]) -> list[Any]: pass
+
+    @abstractmethod
+    async def set_many(self, values: dict[str, Any], ttl: int = None) -> None: pass
+
+    @abstractmethod
+    async def set_many_if(
+            self,
+            values: dict[str, Any],
+            guards: dict[str, tuple[str, Any]],
+            ttl: int = None
+    ) -> None: pass
+
+    @abstractmethod
+    async def hget(self, key: str, field: str) -> Any: pass
+
+    @abstractmethod
+    async def hset(self, key: str, field: str, value: Any, ttl: int = None) -> None: pass
+
+    @abstractmethod
+    async def hset_if(
+            self,
+            key: str,
+            field: str,
+            value: Any,
+            guard: tuple[str, Any],
+            ttl: int = None
+    ) -> None: pass
+
+    @abstractmethod
+    async def invalidate(self, keys: list[str], generation_keys: list[str], generation_ttl: int = None) -> None: pass
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Any) -> int: pass
+
+    @abstractmethod
+    def listen(self, channel: str) -> AsyncIterator[Any]: pass
+
 
 class IDB(Protocol):
 
     @abstractmethod
-    async def insert(self, query: str, query_params: dict) -> int: pass
+    def transaction(self) -> AsyncContextManager[None]: pass
 
     @abstractmethod
-    async def delete(self, query: str, query_params: dict) -> None: pass
+    def in_transaction(self) -> bool: pass
 
     @abstractmethod
-    async def update(self, query: str, query_params: dict) -> None: pass
+    def primary(self) -> AsyncContextManager[None]: pass
 
     @abstractmethod
-    async def select(self, query: str, query_params: dict) -> Sequence[Any]: pass
+    def primary_pinned(self) -> bool: pass
 
     @abstractmethod
-    async def multi_query(self, queries: list[str]) -> None: pass
+    async def insert(self, query: str, query_params: dict, query_name: str = "unnamed") -> int: pass
 
+    @abstractmethod
+    async def bulk_insert(
+            self,
+            table: str,
+            columns: list[str],
+            records: list[tuple],
+            id_column: str = "id",
+            query_name: str = "unnamed"
+    ) -> list[int]: pass
+
+    @abstractmethod
+    async def delete(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]: pass
+
+    @abstractmethod
+    async def update(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]: pass
+
+    @abstractmethod
+    async def select(self, query: str, query_params: dict, query_name: str = "unnamed") -> Sequence[Any]: pass
+
+    @abstractmethod
+    def stream(
+            self,
+            query: str,
+            query_params: dict,
+            batch_size: int = 500,
+            query_name: str = "unnamed"
+    ) -> AsyncIterator[Sequence[Any]]: pass
+
+    @abstractmethod
+    async def multi_query(self, queries: list[str], query_name: str = "unnamed") -> None: pass
+
+    @abstractmethod
+    async def autocommit_query(self, queries: list[str], query_name: str = "unnamed") -> None: pass
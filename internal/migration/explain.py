@@ -0,0 +1,137 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from contextvars import ContextVar
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from infrastructure.pg.pg import PG
+from infrastructure.pg.raw_pg import compile_query
+from infrastructure.telemetry.telemetry import Telemetry
+from internal.config.config import Config
+from internal.migration.manager import MigrationManager
+from internal.repo.employee import sql_query
+
+# Синтетические данные: организации по ORGANIZATION_SIZE сотрудников
+ORGANIZATION_SIZE = 100
+
+load_synthetic_employees = """
+INSERT INTO employees (organization_id, invited_from_account_id, account_id, name, role, created_at)
+SELECT
+    n / :organization_size + 1,
+    0,
+    n,
+    'employee_' || n,
+    (ARRAY['admin', 'moderator', 'employee'])[n % 3 + 1],
+    now() - n * interval '1 second'
+FROM generate_series(1, :rows) AS n;
+"""
+
+# Значения параметров запросов из sql_query.py для EXPLAIN
+sample_params = {
+    "account_id": 42,
+    "account_ids": [42, 43, 44],
+    "organization_id": 7,
+    "invited_from_account_id": 0,
+    "name": "employee",
+    "role": "employee",
+    "limit": 50,
+    "cursor_created_at": datetime(2024, 1, 1),
+    "cursor_id": 1000,
+    "required_moderation": None,
+    "autoposting_permission": True,
+    "add_employee_permission": None,
+    "edit_employee_perm_permission": None,
+    "top_up_balance_permission": None,
+    "sign_up_social_net_permission": None,
+    "setting_category_permission": None,
+    "setting_organization_permission": None,
+}
+
+
+def _scans(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _scans(child)
+
+
+async def check_query(db: PG, query_name: str, query: str) -> list[str]:
+    _, param_names = compile_query(query)
+    params = {name: sample_params[name] for name in param_names}
+
+    rows = await db.select(f"EXPLAIN (FORMAT JSON) {query}", params, query_name=f"explain_{query_name}")
+    plan = rows[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return [
+        node.get("Relation Name", "")
+        for node in _scans(plan[0]["Plan"])
+        if node["Node Type"] == "Seq Scan"
+    ]
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Проверка планов запросов sql_query.py на синтетических данных')
+    parser.add_argument('--rows', type=int, default=100_000, help='Количество синтетических сотрудников')
+    args = parser.parse_args()
+
+    cfg = Config()
+    if cfg.environment == "prod":
+        print("❌ Проверка планов пересоздает таблицы и не запускается в prod", flush=True)
+        sys.exit(1)
+
+    log_context: ContextVar[dict] = ContextVar('log_context', default={})
+
+    tel = Telemetry(
+        cfg.log_level,
+        cfg.root_path,
+        cfg.environment,
+        cfg.service_name + "-explain",
+        cfg.service_version,
+        cfg.otlp_host,
+        cfg.otlp_port,
+        log_context
+    )
+
+    db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
+    manager = MigrationManager(db)
+    await manager.drop_tables()
+    await manager.migrate()
+
+    print(f"📥 Загрузка {args.rows} синтетических сотрудников...", flush=True)
+    await db.update(
+        load_synthetic_employees,
+        {"rows": args.rows, "organization_size": ORGANIZATION_SIZE},
+        query_name="load_synthetic_employees"
+    )
+    await db.multi_query(["ANALYZE employees;"])
+
+    failed = []
+    for query_name, query in vars(sql_query).items():
+        if query_name.startswith("_") or not isinstance(query, str):
+            continue
+        if not query.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            continue
+        # Шаблоны с проекцией колонок проверяем на полном наборе колонок
+        query = query.replace("{columns}", "*")
+
+        seq_scans = await check_query(db, query_name, query)
+        if seq_scans:
+            failed.append(query_name)
+            print(f"❌ {query_name}: Seq Scan по {', '.join(seq_scans)}", flush=True)
+        else:
+            print(f"✅ {query_name}: индекс используется", flush=True)
+
+    if failed:
+        print(f"❌ Запросы без индекса: {', '.join(failed)}", flush=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -28,7 +28,8 @@ async def main():
         log_context
     )
 
-    db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
+    # Миграции переписывают таблицы целиком: таймаут запросов сервиса к ним не применяется
+    db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name, statement_timeout=0)
     manager = MigrationManager(db)
 
     import argparse
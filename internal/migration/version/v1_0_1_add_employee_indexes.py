@@ -0,0 +1,49 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddEmployeeIndexesMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_1",
+            name="add_employee_indexes",
+            depends_on="v1_0_0"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_employees_account_id_index,
+            create_employees_organization_created_at_index
+        ]
+
+        # CONCURRENTLY строит индекс, не блокируя запись в employees, но только вне транзакции
+        await db.autocommit_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_employees_organization_created_at_index,
+            drop_employees_account_id_index
+        ]
+
+        await db.autocommit_query(queries)
+
+create_employees_account_id_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_employees_account_id
+ON employees (account_id);
+"""
+
+# Порядок индекса совпадает с ORDER BY листинга организации, сортировка не нужна
+create_employees_organization_created_at_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_employees_organization_created_at
+ON employees (organization_id, created_at DESC, id DESC)
+INCLUDE (account_id, role);
+"""
+
+drop_employees_account_id_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_employees_account_id;
+"""
+
+drop_employees_organization_created_at_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_employees_organization_created_at;
+"""
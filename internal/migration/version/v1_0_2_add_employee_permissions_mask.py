@@ -0,0 +1,121 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddEmployeePermissionsMaskMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_2",
+            name="add_employee_permissions_mask",
+            depends_on="v1_0_1"
+        )
+
+    async def up(self, db: interface.IDB):
+        # Колонка с постоянным default добавляется без перезаписи таблицы. Триггер фиксируется
+        # до заполнения: строки, записанные во время него, получают маску сразу
+        await db.multi_query([
+            add_permissions_column,
+            create_sync_permissions_function,
+            create_sync_permissions_trigger
+        ])
+
+        # Существующие строки заполняются пачками по id, каждая пачка — отдельная короткая транзакция
+        rows = await db.select(get_max_employee_id, {})
+        max_id = rows[0][0] or 0
+        for after_id in range(0, max_id, permissions_backfill_batch_size):
+            await db.update(backfill_permissions_batch, {
+                'after_id': after_id,
+                'until_id': after_id + permissions_backfill_batch_size
+            })
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_sync_permissions_trigger,
+            drop_sync_permissions_function,
+            drop_permissions_column
+        ]
+
+        await db.multi_query(queries)
+
+# Биты совпадают с model.EmployeePermission
+add_permissions_column = """
+ALTER TABLE employees
+ADD COLUMN IF NOT EXISTS permissions INTEGER NOT NULL DEFAULT 0;
+"""
+
+permissions_backfill_batch_size = 10000
+
+get_max_employee_id = """
+SELECT MAX(id) FROM employees;
+"""
+
+backfill_permissions_batch = """
+UPDATE employees
+SET permissions = CAST(COALESCE(required_moderation, FALSE) AS INTEGER)
+    | CAST(COALESCE(autoposting_permission, FALSE) AS INTEGER) * 2
+    | CAST(COALESCE(add_employee_permission, FALSE) AS INTEGER) * 4
+    | CAST(COALESCE(edit_employee_perm_permission, FALSE) AS INTEGER) * 8
+    | CAST(COALESCE(top_up_balance_permission, FALSE) AS INTEGER) * 16
+    | CAST(COALESCE(sign_up_social_net_permission, FALSE) AS INTEGER) * 32
+    | CAST(COALESCE(setting_category_permission, FALSE) AS INTEGER) * 64
+    | CAST(COALESCE(setting_organization_permission, FALSE) AS INTEGER) * 128
+WHERE id > :after_id AND id <= :until_id;
+"""
+
+# На переходный период булевы колонки и маска синхронизируются в обе стороны:
+# если запись меняет маску — из неё выводятся флаги, иначе маска пересчитывается из флагов
+create_sync_permissions_function = """
+CREATE OR REPLACE FUNCTION employees_sync_permissions() RETURNS TRIGGER AS $$
+DECLARE
+    from_mask BOOLEAN = FALSE;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        from_mask = NEW.permissions <> 0;
+    ELSIF NEW.permissions IS DISTINCT FROM OLD.permissions THEN
+        from_mask = TRUE;
+    END IF;
+
+    IF from_mask THEN
+        NEW.required_moderation = (NEW.permissions & 1) <> 0;
+        NEW.autoposting_permission = (NEW.permissions & 2) <> 0;
+        NEW.add_employee_permission = (NEW.permissions & 4) <> 0;
+        NEW.edit_employee_perm_permission = (NEW.permissions & 8) <> 0;
+        NEW.top_up_balance_permission = (NEW.permissions & 16) <> 0;
+        NEW.sign_up_social_net_permission = (NEW.permissions & 32) <> 0;
+        NEW.setting_category_permission = (NEW.permissions & 64) <> 0;
+        NEW.setting_organization_permission = (NEW.permissions & 128) <> 0;
+    ELSE
+        NEW.permissions = CAST(COALESCE(NEW.required_moderation, FALSE) AS INTEGER)
+            | CAST(COALESCE(NEW.autoposting_permission, FALSE) AS INTEGER) * 2
+            | CAST(COALESCE(NEW.add_employee_permission, FALSE) AS INTEGER) * 4
+            | CAST(COALESCE(NEW.edit_employee_perm_permission, FALSE) AS INTEGER) * 8
+            | CAST(COALESCE(NEW.top_up_balance_permission, FALSE) AS INTEGER) * 16
+            | CAST(COALESCE(NEW.sign_up_social_net_permission, FALSE) AS INTEGER) * 32
+            | CAST(COALESCE(NEW.setting_category_permission, FALSE) AS INTEGER) * 64
+            | CAST(COALESCE(NEW.setting_organization_permission, FALSE) AS INTEGER) * 128;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+create_sync_permissions_trigger = """
+CREATE OR REPLACE TRIGGER employees_sync_permissions
+BEFORE INSERT OR UPDATE ON employees
+FOR EACH ROW EXECUTE FUNCTION employees_sync_permissions();
+"""
+
+drop_sync_permissions_trigger = """
+DROP TRIGGER IF EXISTS employees_sync_permissions ON employees;
+"""
+
+drop_sync_permissions_function = """
+DROP FUNCTION IF EXISTS employees_sync_permissions();
+"""
+
+drop_permissions_column = """
+ALTER TABLE employees
+DROP COLUMN IF EXISTS permissions;
+"""
@@ -0,0 +1,38 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddEmployeeAggregateIndexMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_3",
+            name="add_employee_aggregate_index",
+            depends_on="v1_0_2"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_employees_organization_role_index
+        ]
+
+        # CONCURRENTLY строит индекс, не блокируя запись в employees, но только вне транзакции
+        await db.autocommit_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_employees_organization_role_index
+        ]
+
+        await db.autocommit_query(queries)
+
+# Агрегаты по организации читаются только из индекса (Index Only Scan), группировка по role без сортировки
+create_employees_organization_role_index = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_employees_organization_role
+ON employees (organization_id, role)
+INCLUDE (permissions);
+"""
+
+drop_employees_organization_role_index = """
+DROP INDEX CONCURRENTLY IF EXISTS idx_employees_organization_role;
+"""
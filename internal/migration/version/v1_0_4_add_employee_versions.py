@@ -0,0 +1,207 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddEmployeeVersionsMigration(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_4",
+            name="add_employee_versions",
+            depends_on="v1_0_3"
+        )
+
+    async def up(self, db: interface.IDB):
+        # Колонка без значения по умолчанию добавляется без перезаписи таблицы,
+        # новые строки получают версию из default с этого момента
+        await db.multi_query([
+            create_employee_version_sequence,
+            add_version_column,
+            set_version_default
+        ])
+
+        # Существующие строки заполняются пачками по id, каждая пачка — отдельная короткая транзакция
+        rows = await db.select(get_max_employee_id, {})
+        max_id = rows[0][0] or 0
+        for after_id in range(0, max_id, version_backfill_batch_size):
+            await db.update(backfill_version_batch, {
+                'after_id': after_id,
+                'until_id': after_id + version_backfill_batch_size
+            })
+
+        # Проверенный CHECK позволяет SET NOT NULL не сканировать таблицу под ACCESS EXCLUSIVE,
+        # а VALIDATE сканирует её под блокировкой, не мешающей чтению и записи
+        await db.multi_query([drop_version_not_null_check, add_version_not_null_check])
+        await db.multi_query([validate_version_not_null_check])
+        await db.multi_query([set_version_not_null, drop_version_not_null_check])
+
+        queries = [
+            create_employee_organization_versions_table,
+            backfill_employee_organization_versions,
+            create_bump_organization_versions_function,
+            create_bump_organization_versions_insert_trigger,
+            create_bump_organization_versions_update_trigger,
+            create_bump_organization_versions_delete_trigger
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_bump_organization_versions_insert_trigger,
+            drop_bump_organization_versions_update_trigger,
+            drop_bump_organization_versions_delete_trigger,
+            drop_bump_organization_versions_function,
+            drop_employee_organization_versions_table,
+            drop_version_column,
+            drop_employee_version_sequence
+        ]
+
+        await db.multi_query(queries)
+
+# Версии сотрудников и организаций берутся из одной последовательности: после удаления
+# и повторного создания сотрудника версия не повторится, и старый ETag не совпадёт
+create_employee_version_sequence = """
+CREATE SEQUENCE IF NOT EXISTS employee_version_seq;
+"""
+
+add_version_column = """
+ALTER TABLE employees
+ADD COLUMN IF NOT EXISTS version BIGINT;
+"""
+
+set_version_default = """
+ALTER TABLE employees
+ALTER COLUMN version SET DEFAULT nextval('employee_version_seq');
+"""
+
+version_backfill_batch_size = 10000
+
+get_max_employee_id = """
+SELECT MAX(id) FROM employees;
+"""
+
+backfill_version_batch = """
+UPDATE employees
+SET version = nextval('employee_version_seq')
+WHERE id > :after_id AND id <= :until_id
+  AND version IS NULL;
+"""
+
+add_version_not_null_check = """
+ALTER TABLE employees
+ADD CONSTRAINT employees_version_not_null CHECK (version IS NOT NULL) NOT VALID;
+"""
+
+validate_version_not_null_check = """
+ALTER TABLE employees
+VALIDATE CONSTRAINT employees_version_not_null;
+"""
+
+set_version_not_null = """
+ALTER TABLE employees
+ALTER COLUMN version SET NOT NULL;
+"""
+
+drop_version_not_null_check = """
+ALTER TABLE employees
+DROP CONSTRAINT IF EXISTS employees_version_not_null;
+"""
+
+create_employee_organization_versions_table = """
+CREATE TABLE IF NOT EXISTS employee_organization_versions (
+    organization_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+"""
+
+backfill_employee_organization_versions = """
+INSERT INTO employee_organization_versions (organization_id, version)
+SELECT organization_id, nextval('employee_version_seq')
+FROM (SELECT DISTINCT organization_id FROM employees) organizations
+ON CONFLICT (organization_id) DO NOTHING;
+"""
+
+# Версия организации поднимается в той же транзакции, что и запись её сотрудников: ETag списка
+# не может отстать от строк. Один оператор — одна версия на организацию, порядок по organization_id
+# одинаков во всех транзакциях и не даёт взаимных блокировок
+create_bump_organization_versions_function = """
+CREATE OR REPLACE FUNCTION employees_bump_organization_versions() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO employee_organization_versions (organization_id, version)
+        SELECT organization_id, nextval('employee_version_seq')
+        FROM (SELECT DISTINCT organization_id FROM new_rows ORDER BY organization_id) organizations
+        ON CONFLICT (organization_id) DO UPDATE SET version = EXCLUDED.version;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO employee_organization_versions (organization_id, version)
+        SELECT organization_id, nextval('employee_version_seq')
+        FROM (
+            SELECT organization_id FROM old_rows
+            UNION
+            SELECT organization_id FROM new_rows
+            ORDER BY organization_id
+        ) organizations
+        ON CONFLICT (organization_id) DO UPDATE SET version = EXCLUDED.version;
+    ELSE
+        INSERT INTO employee_organization_versions (organization_id, version)
+        SELECT organization_id, nextval('employee_version_seq')
+        FROM (SELECT DISTINCT organization_id FROM old_rows ORDER BY organization_id) organizations
+        ON CONFLICT (organization_id) DO UPDATE SET version = EXCLUDED.version;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Таблицы переходов допускаются только у триггера на одно событие
+create_bump_organization_versions_insert_trigger = """
+CREATE OR REPLACE TRIGGER employees_bump_organization_versions_insert
+AFTER INSERT ON employees
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION employees_bump_organization_versions();
+"""
+
+create_bump_organization_versions_update_trigger = """
+CREATE OR REPLACE TRIGGER employees_bump_organization_versions_update
+AFTER UPDATE ON employees
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION employees_bump_organization_versions();
+"""
+
+create_bump_organization_versions_delete_trigger = """
+CREATE OR REPLACE TRIGGER employees_bump_organization_versions_delete
+AFTER DELETE ON employees
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION employees_bump_organization_versions();
+"""
+
+drop_bump_organization_versions_insert_trigger = """
+DROP TRIGGER IF EXISTS employees_bump_organization_versions_insert ON employees;
+"""
+
+drop_bump_organization_versions_update_trigger = """
+DROP TRIGGER IF EXISTS employees_bump_organization_versions_update ON employees;
+"""
+
+drop_bump_organization_versions_delete_trigger = """
+DROP TRIGGER IF EXISTS employees_bump_organization_versions_delete ON employees;
+"""
+
+drop_bump_organization_versions_function = """
+DROP FUNCTION IF EXISTS employees_bump_organization_versions();
+"""
+
+drop_employee_organization_versions_table = """
+DROP TABLE IF EXISTS employee_organization_versions;
+"""
+
+drop_version_column = """
+ALTER TABLE employees
+DROP COLUMN IF EXISTS version;
+"""
+
+drop_employee_version_sequence = """
+DROP SEQUENCE IF EXISTS employee_version_seq;
+"""
@@ -1,7 +1,8 @@
 from datetime import datetime
 from dataclasses import dataclass
-from typing import List, Optional
-from enum import Enum
+from operator import itemgetter
+from typing import Callable, List, Optional, Sequence
+from enum import Enum, IntFlag
 
 
 class EmployeeRole(Enum):
@@ -10,65 +11,284 @@ class EmployeeRole(Enum):
     EMPLOYEE = "employee"
 
 
-@dataclass
+class EmployeePermission(IntFlag):
+    # Биты совпадают с колонкой employees.permissions
+    REQUIRED_MODERATION = 1
+    AUTOPOSTING = 2
+    ADD_EMPLOYEE = 4
+    EDIT_EMPLOYEE_PERM = 8
+    TOP_UP_BALANCE = 16
+    SIGN_UP_SOCIAL_NET = 32
+    SETTING_CATEGORY = 64
+    SETTING_ORGANIZATION = 128
+
+
+permission_by_name = {
+    "required_moderation": EmployeePermission.REQUIRED_MODERATION,
+    "autoposting_permission": EmployeePermission.AUTOPOSTING,
+    "add_employee_permission": EmployeePermission.ADD_EMPLOYEE,
+    "edit_employee_perm_permission": EmployeePermission.EDIT_EMPLOYEE_PERM,
+    "top_up_balance_permission": EmployeePermission.TOP_UP_BALANCE,
+    "sign_up_social_net_permission": EmployeePermission.SIGN_UP_SOCIAL_NET,
+    "setting_category_permission": EmployeePermission.SETTING_CATEGORY,
+    "setting_organization_permission": EmployeePermission.SETTING_ORGANIZATION,
+}
+
+
+# Поля сотрудника в ответах API; совпадают с именами колонок employees
+employee_fields = (
+    "id",
+    "organization_id",
+    "invited_from_account_id",
+    "account_id",
+    "required_moderation",
+    "autoposting_permission",
+    "add_employee_permission",
+    "edit_employee_perm_permission",
+    "top_up_balance_permission",
+    "sign_up_social_net_permission",
+    "setting_category_permission",
+    "setting_organization_permission",
+    "name",
+    "role",
+    "created_at",
+)
+
+
+@dataclass(frozen=True)
+class EmployeePermissionSnapshot:
+    role: EmployeeRole
+    permissions: int
+
+    @property
+    def version(self) -> str:
+        # Меняется при любом изменении роли или прав — используется как ETag
+        return f"{self.role.value}-{self.permissions}"
+
+    def has_permission(self, permission: EmployeePermission) -> bool:
+        return self.permissions & permission.value == permission.value
+
+    def allows(self, permission_type: str) -> bool:
+        # Админы имеют все права
+        if self.role == EmployeeRole.ADMIN:
+            return True
+
+        permission = permission_by_name.get(permission_type)
+        return permission is not None and self.has_permission(permission)
+
+
+# EmployeeRole(value) проходит через метакласс Enum — словарь заметно дешевле на каждой строке
+role_by_value = {role.value: role for role in EmployeeRole}
+
+
+def _permission_flags(permissions: int) -> dict[str, bool]:
+    return {
+        permission_type: permissions & permission.value == permission.value
+        for permission_type, permission in permission_by_name.items()
+    }
+
+
+# Маска прав занимает 8 бит: флаги для всех 256 значений считаются один раз
+_permission_flags_by_mask = [_permission_flags(permissions) for permissions in range(256)]
+
+
+# Порядок совпадает с порядком полей Employee
+_serialize_columns = (
+    "id", "organization_id", "account_id", "invited_from_account_id", "permissions", "name", "role", "created_at",
+    "version"
+)
+
+
+def _row_getter(row, columns: Sequence[str]) -> Callable:
+    # SQLAlchemy Row хранит имена колонок в _fields, asyncpg Record отдаёт их через keys()
+    names = row._fields if hasattr(row, "_fields") else tuple(row.keys())
+    positions = {name: position for position, name in enumerate(names)}
+    return itemgetter(*[positions[column] for column in columns])
+
+
+@dataclass(slots=True)
 class Employee:
     id: int
     organization_id: int
     account_id: int
     invited_from_account_id: int
 
-    required_moderation: bool
-    autoposting_permission: bool
-    add_employee_permission: bool
-    edit_employee_perm_permission: bool
-    top_up_balance_permission: bool
-    sign_up_social_net_permission: bool
-    setting_category_permission: bool
-    setting_organization_permission: bool
+    permissions: int
 
     name: str
     role: EmployeeRole
 
     created_at: datetime
 
+    # Растёт при каждой записи сотрудника; в ответ API не входит, на ней строится ETag
+    version: int | None = None
+
+    def has_permission(self, permission: EmployeePermission) -> bool:
+        return self.permissions & permission.value == permission.value
+
+    def permission_snapshot(self) -> EmployeePermissionSnapshot:
+        return EmployeePermissionSnapshot(role=self.role, permissions=self.permissions)
+
+    @property
+    def required_moderation(self) -> bool:
+        return self.has_permission(EmployeePermission.REQUIRED_MODERATION)
+
+    @property
+    def autoposting_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.AUTOPOSTING)
+
+    @property
+    def add_employee_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.ADD_EMPLOYEE)
+
+    @property
+    def edit_employee_perm_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.EDIT_EMPLOYEE_PERM)
+
+    @property
+    def top_up_balance_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.TOP_UP_BALANCE)
+
+    @property
+    def sign_up_social_net_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.SIGN_UP_SOCIAL_NET)
+
+    @property
+    def setting_category_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.SETTING_CATEGORY)
+
+    @property
+    def setting_organization_permission(self) -> bool:
+        return self.has_permission(EmployeePermission.SETTING_ORGANIZATION)
+
     @classmethod
     def serialize(cls, rows) -> List['Employee']:
+        if not rows:
+            return []
+
+        # Позиции колонок вычисляются один раз на выборку, дальше строки читаются по индексу без getattr
+        getter = _row_getter(rows[0], _serialize_columns)
+        return [
+            cls(id_, organization_id, account_id, invited_from_account_id, permissions, name,
+                role_by_value[role], created_at, version)
+            for id_, organization_id, account_id, invited_from_account_id, permissions, name, role, created_at, version
+            in map(getter, rows)
+        ]
+
+    @classmethod
+    def deserialize(cls, items: list[dict]) -> List['Employee']:
         return [
             cls(
-                id=row.id,
-                organization_id=row.organization_id,
-                invited_from_account_id=row.invited_from_account_id,
-                account_id=row.account_id,
-                required_moderation=row.required_moderation,
-                autoposting_permission=row.autoposting_permission,
-                add_employee_permission=row.add_employee_permission,
-                edit_employee_perm_permission=row.edit_employee_perm_permission,
-                top_up_balance_permission=row.top_up_balance_permission,
-                sign_up_social_net_permission=row.sign_up_social_net_permission,
-                setting_category_permission=row.setting_category_permission,
-                setting_organization_permission=row.setting_organization_permission,
-                name=row.name,
-                role=EmployeeRole(row.role),
-                created_at=row.created_at
+                id=item["id"],
+                organization_id=item["organization_id"],
+                invited_from_account_id=item["invited_from_account_id"],
+                account_id=item["account_id"],
+                permissions=item["permissions"],
+                name=item["name"],
+                role=role_by_value[item["role"]],
+                created_at=datetime.fromisoformat(item["created_at"]),
+                # Записи кэша, сохранённые до появления версии, остаются без ETag
+                version=item.get("version")
             )
-            for row in rows
+            for item in items
         ]
 
-    def to_dict(self) -> dict:
+    def to_cache_dict(self) -> dict:
         return {
             "id": self.id,
             "organization_id": self.organization_id,
             "invited_from_account_id": self.invited_from_account_id,
             "account_id": self.account_id,
-            "required_moderation": self.required_moderation,
-            "autoposting_permission": self.autoposting_permission,
-            "add_employee_permission": self.add_employee_permission,
-            "edit_employee_perm_permission": self.edit_employee_perm_permission,
-            "top_up_balance_permission": self.top_up_balance_permission,
-            "sign_up_social_net_permission": self.sign_up_social_net_permission,
-            "setting_category_permission": self.setting_category_permission,
-            "setting_organization_permission": self.setting_organization_permission,
+            "permissions": self.permissions,
+            "name": self.name,
+            "role": self.role.value,
+            "created_at": self.created_at.isoformat(),
+            "version": self.version
+        }
+
+    @staticmethod
+    def project(rows, fields: Sequence[str]) -> list[dict]:
+        # Строки с выбранными колонками сразу превращаются в JSON-совместимые словари, минуя Employee
+        if not rows:
+            return []
+
+        getter = _row_getter(rows[0], fields)
+        if len(fields) == 1:
+            items = [{fields[0]: value} for value in map(getter, rows)]
+        else:
+            items = [dict(zip(fields, values)) for values in map(getter, rows)]
+
+        if "created_at" in fields:
+            for item in items:
+                item["created_at"] = item["created_at"].isoformat()
+
+        return items
+
+    def to_dict(self, fields: Sequence[str] | None = None) -> dict:
+        if fields is not None:
+            item = {field: getattr(self, field) for field in fields}
+            if "created_at" in item:
+                item["created_at"] = self.created_at.isoformat()
+            if "role" in item:
+                item["role"] = self.role.value
+            return item
+
+        return {
+            "id": self.id,
+            "organization_id": self.organization_id,
+            "invited_from_account_id": self.invited_from_account_id,
+            "account_id": self.account_id,
+            **_permission_flags_by_mask[self.permissions & 0xFF],
             "name": self.name,
             "role": self.role.value,
             "created_at": self.created_at.isoformat()
         }
+
+    def to_encodable_dict(self) -> dict:
+        # Форма to_dict(), но datetime и Enum остаются как есть: JSON-кодировщик ответа пишет их сам.
+        # Словарь живёт, пока orjson пишет одну строку, и на пик памяти не влияет. Прямое кодирование
+        # dataclass требует полей в форме API (8 флагов вместо маски): Employee становится больше
+        # и медленнее собирается из строк, а кодирование не ускоряется
+        return {
+            "id": self.id,
+            "organization_id": self.organization_id,
+            "invited_from_account_id": self.invited_from_account_id,
+            "account_id": self.account_id,
+            **_permission_flags_by_mask[self.permissions & 0xFF],
+            "name": self.name,
+            "role": self.role,
+            "created_at": self.created_at
+        }
+
+
+@dataclass
+class EmployeeAggregates:
+    organization_id: int
+    total: int
+    roles: dict[str, int]
+    permissions: dict[str, int]
+
+    @classmethod
+    def serialize(cls, organization_id: int, rows) -> 'EmployeeAggregates':
+        # Одна строка на роль; счётчики прав суммируются по ролям
+        roles = {role.value: 0 for role in EmployeeRole}
+        permissions = dict.fromkeys(permission_by_name, 0)
+        for row in rows:
+            roles[row.role] = row.total
+            for permission_type in permissions:
+                permissions[permission_type] += getattr(row, permission_type)
+
+        return cls(
+            organization_id=organization_id,
+            total=sum(roles.values()),
+            roles=roles,
+            permissions=permissions
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "organization_id": self.organization_id,
+            "total": self.total,
+            "roles": self.roles,
+            "permissions": self.permissions
+        }
@@ -1,4 +1,10 @@
 
+# Версии сотрудников и организаций берутся из одной последовательности: после удаления
+# и повторного создания сотрудника версия не повторится, и старый ETag не совпадёт
+create_employee_version_sequence = """
+CREATE SEQUENCE IF NOT EXISTS employee_version_seq;
+"""
+
 create_employees_table = """
 CREATE TABLE IF NOT EXISTS employees (
     id SERIAL PRIMARY KEY,
@@ -15,23 +21,179 @@ CREATE TABLE IF NOT EXISTS employees (
     sign_up_social_net_permission BOOLEAN DEFAULT FALSE,
     setting_category_permission BOOLEAN DEFAULT FALSE,
     setting_organization_permission BOOLEAN DEFAULT FALSE,
+    permissions INTEGER NOT NULL DEFAULT 0,
 
     name TEXT NOT NULL,
     role TEXT NOT NULL,
 
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version BIGINT NOT NULL DEFAULT nextval('employee_version_seq')
+);
+"""
+
+create_employee_organization_versions_table = """
+CREATE TABLE IF NOT EXISTS employee_organization_versions (
+    organization_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL
 );
 """
 
+create_employees_account_id_index = """
+CREATE INDEX IF NOT EXISTS idx_employees_account_id
+ON employees (account_id);
+"""
+
+create_employees_organization_created_at_index = """
+CREATE INDEX IF NOT EXISTS idx_employees_organization_created_at
+ON employees (organization_id, created_at DESC, id DESC)
+INCLUDE (account_id, role);
+"""
+
+create_employees_organization_role_index = """
+CREATE INDEX IF NOT EXISTS idx_employees_organization_role
+ON employees (organization_id, role)
+INCLUDE (permissions);
+"""
+
+# На переходный период булевы колонки и маска синхронизируются в обе стороны:
+# если запись меняет маску — из неё выводятся флаги, иначе маска пересчитывается из флагов
+create_sync_permissions_function = """
+CREATE OR REPLACE FUNCTION employees_sync_permissions() RETURNS TRIGGER AS $$
+DECLARE
+    from_mask BOOLEAN = FALSE;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        from_mask = NEW.permissions <> 0;
+    ELSIF NEW.permissions IS DISTINCT FROM OLD.permissions THEN
+        from_mask = TRUE;
+    END IF;
+
+    IF from_mask THEN
+        NEW.required_moderation = (NEW.permissions & 1) <> 0;
+        NEW.autoposting_permission = (NEW.permissions & 2) <> 0;
+        NEW.add_employee_permission = (NEW.permissions & 4) <> 0;
+        NEW.edit_employee_perm_permission = (NEW.permissions & 8) <> 0;
+        NEW.top_up_balance_permission = (NEW.permissions & 16) <> 0;
+        NEW.sign_up_social_net_permission = (NEW.permissions & 32) <> 0;
+        NEW.setting_category_permission = (NEW.permissions & 64) <> 0;
+        NEW.setting_organization_permission = (NEW.permissions & 128) <> 0;
+    ELSE
+        NEW.permissions = CAST(COALESCE(NEW.required_moderation, FALSE) AS INTEGER)
+            | CAST(COALESCE(NEW.autoposting_permission, FALSE) AS INTEGER) * 2
+            | CAST(COALESCE(NEW.add_employee_permission, FALSE) AS INTEGER) * 4
+            | CAST(COALESCE(NEW.edit_employee_perm_permission, FALSE) AS INTEGER) * 8
+            | CAST(COALESCE(NEW.top_up_balance_permission, FALSE) AS INTEGER) * 16
+            | CAST(COALESCE(NEW.sign_up_social_net_permission, FALSE) AS INTEGER) * 32
+            | CAST(COALESCE(NEW.setting_category_permission, FALSE) AS INTEGER) * 64
+            | CAST(COALESCE(NEW.setting_organization_permission, FALSE) AS INTEGER) * 128;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+create_sync_permissions_trigger = """
+CREATE OR REPLACE TRIGGER employees_sync_permissions
+BEFORE INSERT OR UPDATE ON employees
+FOR EACH ROW EXECUTE FUNCTION employees_sync_permissions();
+"""
+
+# Версия организации поднимается в той же транзакции, что и запись её сотрудников: ETag списка
+# не может отстать от строк. Один оператор — одна версия на организацию, порядок по organization_id
+# одинаков во всех транзакциях и не даёт взаимных блокировок
+create_bump_organization_versions_function = """
+CREATE OR REPLACE FUNCTION employees_bump_organization_versions() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO employee_organization_versions (organization_id, version)
+        SELECT organization_id, nextval('employee_version_seq')
+        FROM (SELECT DISTINCT organization_id FROM new_rows ORDER BY organization_id) organizations
+        ON CONFLICT (organization_id) DO UPDATE SET version = EXCLUDED.version;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO employee_organization_versions (organization_id, version)
+        SELECT organization_id, nextval('employee_version_seq')
+        FROM (
+            SELECT organization_id FROM old_rows
+            UNION
+            SELECT organization_id FROM new_rows
+            ORDER BY organization_id
+        ) organizations
+        ON CONFLICT (organization_id) DO UPDATE SET version = EXCLUDED.version;
+    ELSE
+        INSERT INTO employee_organization_versions (organization_id, version)
+        SELECT organization_id, nextval('employee_version_seq')
+        FROM (SELECT DISTINCT organization_id FROM old_rows ORDER BY organization_id) organizations
+        ON CONFLICT (organization_id) DO UPDATE SET version = EXCLUDED.version;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Таблицы переходов допускаются только у триггера на одно событие
+create_bump_organization_versions_insert_trigger = """
+CREATE OR REPLACE TRIGGER employees_bump_organization_versions_insert
+AFTER INSERT ON employees
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION employees_bump_organization_versions();
+"""
+
+create_bump_organization_versions_update_trigger = """
+CREATE OR REPLACE TRIGGER employees_bump_organization_versions_update
+AFTER UPDATE ON employees
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION employees_bump_organization_versions();
+"""
+
+create_bump_organization_versions_delete_trigger = """
+CREATE OR REPLACE TRIGGER employees_bump_organization_versions_delete
+AFTER DELETE ON employees
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION employees_bump_organization_versions();
+"""
+
 drop_employees_table = """
 DROP TABLE IF EXISTS employees CASCADE;
 """
 
+drop_employee_organization_versions_table = """
+DROP TABLE IF EXISTS employee_organization_versions;
+"""
+
+drop_employee_version_sequence = """
+DROP SEQUENCE IF EXISTS employee_version_seq;
+"""
+
+drop_sync_permissions_function = """
+DROP FUNCTION IF EXISTS employees_sync_permissions();
+"""
+
+drop_bump_organization_versions_function = """
+DROP FUNCTION IF EXISTS employees_bump_organization_versions();
+"""
+
 
 create_organization_tables_queries = [
+    create_employee_version_sequence,
     create_employees_table,
+    create_employee_organization_versions_table,
+    create_employees_account_id_index,
+    create_employees_organization_created_at_index,
+    create_employees_organization_role_index,
+    create_sync_permissions_function,
+    create_sync_permissions_trigger,
+    create_bump_organization_versions_function,
+    create_bump_organization_versions_insert_trigger,
+    create_bump_organization_versions_update_trigger,
+    create_bump_organization_versions_delete_trigger,
 ]
 
 drop_queries = [
     drop_employees_table,
+    drop_employee_organization_versions_table,
+    drop_sync_permissions_function,
+    drop_bump_organization_versions_function,
+    drop_employee_version_sequence,
 ]
\ No newline at end of file
@@ -1,18 +1,76 @@
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, AsyncContextManager, AsyncIterator, Callable
+
 from .sql_query import *
 from internal import interface, model
 
+from pkg.batch_loader import BatchLoader
 from pkg.trace_wrapper import traced_method
 
+employee_cache_channel = "employee:invalidate"
+
+# Счётчик поколений должен жить дольше любого чтения: истёкший и созданный заново счётчик
+# совпал бы со значением, прочитанным до записи
+generation_ttl = 24 * 60 * 60
+
+
+def _account_key(account_id: int) -> str:
+    return f"employee:account:{account_id}"
+
+
+def _organization_key(organization_id: int) -> str:
+    # Хэш: поля — первые страницы, агрегаты и версия, удаление ключа сбрасывает все варианты
+    return f"employee:organization:{organization_id}"
+
+
+def _generation_key(key: str) -> str:
+    # Растёт при каждой инвалидации key: заполнение, начатое до неё, не запишет старое значение
+    return f"{key}:generation"
+
+
+def _organization_version(rows) -> int | None:
+    # Версия организации приходит в каждой строке страницы, пустая страница её не несёт
+    return rows[0].organization_version if rows else None
+
 
 class EmployeeRepo(interface.IEmployeeRepo):
     def __init__(
             self,
             tel: interface.ITelemetry,
             db: interface.IDB,
+            loader_max_batch_size: int = 500,
+            cache: interface.IRedis | None = None,
+            cache_ttl: int = 60,
     ):
         self.tracer = tel.tracer()
+        self.logger = tel.logger()
         self.db = db
 
+        # Общий для всех реплик кэш в Redis; None — читаем только из БД
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self._invalidation_handlers: list[Callable[[list[int] | None], None]] = []
+        self._invalidation_listener: asyncio.Task | None = None
+
+        self.cache_requests = tel.meter().create_counter(
+            "employee.cache.requests",
+            description="Обращения к кэшу сотрудников в Redis по результату (hit/miss)",
+        )
+
+        # Одновременные запросы сотрудников по account_id объединяются в один SELECT ... ANY
+        # Пачка уходит в primary, если хотя бы один ожидающий привязан к нему после своей записи
+        self.employee_loader = BatchLoader(
+            self._load_employees_by_account_ids,
+            max_batch_size=loader_max_batch_size,
+            default=[],
+            pinned=self.db.primary_pinned,
+        )
+
+    def primary(self) -> AsyncContextManager[None]:
+        return self.db.primary()
+
     @traced_method()
     async def create_employee(
             self,
@@ -46,25 +104,283 @@ class EmployeeRepo(interface.IEmployeeRepo):
             'setting_organization_permission': setting_organization_permission,
         }
 
-        employee_id = await self.db.insert(create_employee, args)
+        employee_id = await self.db.insert(create_employee, args, query_name="create_employee")
+        await self._invalidate([account_id], [organization_id])
 
         return employee_id
 
+    @traced_method()
+    async def create_employees(self, employees: list[dict]) -> list[int]:
+        records = [
+            tuple(employee[column] for column in employee_copy_columns)
+            for employee in employees
+        ]
+
+        employee_ids = await self.db.bulk_insert(
+            employees_table,
+            employee_copy_columns,
+            records,
+            query_name="create_employees"
+        )
+        await self._invalidate(
+            [employee["account_id"] for employee in employees],
+            list({employee["organization_id"] for employee in employees})
+        )
+
+        return employee_ids
+
     @traced_method()
     async def get_employee_by_account_id(self, account_id: int) -> list[model.Employee]:
-        args = {'account_id': account_id}
-        rows = await self.db.select(get_employee_by_account_id, args)
-        employees = model.Employee.serialize(rows) if rows else []
+        employees = await self.employee_loader.load(account_id)
+        return list(employees)
+
+    @traced_method()
+    async def get_employees_by_account_ids(self, account_ids: list[int]) -> dict[int, list[model.Employee]]:
+        return await self._load_employees_by_account_ids(list(dict.fromkeys(account_ids)), self.db.primary_pinned())
+
+    async def _load_employees_by_account_ids(
+            self,
+            account_ids: list[int],
+            primary: bool = False
+    ) -> dict[int, list[model.Employee]]:
+        employees: dict[int, list[model.Employee]] = {}
+        missing = account_ids
+        generations: dict[int, Any] = {}
+
+        use_cache = self.cache is not None
+        if use_cache:
+            keys = [_account_key(account_id) for account_id in account_ids]
+            # Поколения читаются тем же MGET, до запроса в БД
+            cached = await self._cache_get([*keys, *[_generation_key(key) for key in keys]])
+            generations = dict(zip(account_ids, cached[len(keys):]))
+            missing = []
+            for account_id, items in zip(account_ids, cached):
+                if items is None:
+                    missing.append(account_id)
+                else:
+                    employees[account_id] = model.Employee.deserialize(items)
+
+            self._record_cache(len(account_ids) - len(missing), len(missing), "get_employee_by_account_id")
+            if not missing:
+                return employees
+
+        args = {'account_ids': missing}
+        async with self._reads(primary or use_cache):
+            rows = await self.db.select(get_employees_by_account_ids, args, query_name="get_employees_by_account_ids")
+
+        loaded: dict[int, list[model.Employee]] = {}
+        for employee in model.Employee.serialize(rows):
+            loaded.setdefault(employee.account_id, []).append(employee)
+        employees.update(loaded)
+
+        if use_cache:
+            # Отсутствующих тоже кэшируем: создание сотрудника инвалидирует ключ
+            await self._cache_set(
+                {
+                    _account_key(account_id): [employee.to_cache_dict() for employee in loaded.get(account_id, [])]
+                    for account_id in missing
+                },
+                {_account_key(account_id): generations.get(account_id) for account_id in missing}
+            )
 
         return employees
 
     @traced_method()
-    async def get_employees_by_organization(self, organization_id: int) -> list[model.Employee]:
+    async def get_employees_by_organization(
+            self,
+            organization_id: int,
+            limit: int,
+            after: tuple[datetime, int] | None = None
+    ) -> tuple[list[model.Employee], int | None]:
+        if after is not None:
+            cursor_created_at, cursor_id = after
+            args = {
+                'organization_id': organization_id,
+                'limit': limit,
+                'cursor_created_at': cursor_created_at,
+                'cursor_id': cursor_id,
+            }
+            rows = await self.db.select(
+                get_employees_page_by_organization_after, args, query_name="get_employees_by_organization_after"
+            )
+            return model.Employee.serialize(rows), _organization_version(rows)
+
+        # Кэшируется только первая страница — её запрашивают чаще всего; версия хранится вместе со строками
+        use_cache = self.cache is not None
+        cache_field = f"page:{limit}"
+        generation = None
+        if use_cache:
+            cached = await self._cache_get_field(_organization_key(organization_id), cache_field)
+            self._record_cache(int(cached is not None), int(cached is None), "get_employees_by_organization")
+            if cached is not None:
+                return model.Employee.deserialize(cached["employees"]), cached["version"]
+            generation = await self._cache_generation(_organization_key(organization_id))
+
+        args = {'organization_id': organization_id, 'limit': limit}
+        async with self._reads(use_cache):
+            rows = await self.db.select(
+                get_employees_page_by_organization, args, query_name="get_employees_by_organization"
+            )
+        employees, version = model.Employee.serialize(rows), _organization_version(rows)
+
+        if use_cache:
+            await self._cache_set_field(
+                _organization_key(organization_id),
+                cache_field,
+                {"version": version, "employees": [employee.to_cache_dict() for employee in employees]},
+                generation
+            )
+
+        return employees, version
+
+    @traced_method()
+    async def get_employee_fields_by_organization(
+            self,
+            organization_id: int,
+            fields: list[str],
+            limit: int,
+            after: tuple[datetime, int] | None = None
+    ) -> tuple[list[dict], int | None]:
+        # Список колонок строится только из известных полей; ключ пагинации нужен сервису для курсора
+        columns = [
+            field for field in model.employee_fields
+            if field in fields or field in ("id", "created_at")
+        ]
+        select_columns = ", ".join(columns)
+
+        if after is not None:
+            cursor_created_at, cursor_id = after
+            args = {
+                'organization_id': organization_id,
+                'limit': limit,
+                'cursor_created_at': cursor_created_at,
+                'cursor_id': cursor_id,
+            }
+            rows = await self.db.select(
+                get_employee_fields_page_by_organization_after.format(columns=select_columns),
+                args,
+                query_name="get_employees_by_organization_after"
+            )
+            return model.Employee.project(rows, columns), _organization_version(rows)
+
+        use_cache = self.cache is not None
+        cache_field = f"page:{limit}:{select_columns}"
+        generation = None
+        if use_cache:
+            cached = await self._cache_get_field(_organization_key(organization_id), cache_field)
+            self._record_cache(int(cached is not None), int(cached is None), "get_employees_by_organization")
+            if cached is not None:
+                return cached["items"], cached["version"]
+            generation = await self._cache_generation(_organization_key(organization_id))
+
+        args = {'organization_id': organization_id, 'limit': limit}
+        async with self._reads(use_cache):
+            rows = await self.db.select(
+                get_employee_fields_page_by_organization.format(columns=select_columns),
+                args,
+                query_name="get_employees_by_organization"
+            )
+        items, version = model.Employee.project(rows, columns), _organization_version(rows)
+
+        if use_cache:
+            await self._cache_set_field(
+                _organization_key(organization_id), cache_field, {"version": version, "items": items}, generation
+            )
+
+        return items, version
+
+    @traced_method()
+    async def get_employee_aggregates_by_organization(self, organization_id: int) -> model.EmployeeAggregates:
+        use_cache = self.cache is not None
+        generation = None
+        if use_cache:
+            cached = await self._cache_get_field(_organization_key(organization_id), "aggregates")
+            self._record_cache(
+                int(cached is not None), int(cached is None), "get_employee_aggregates_by_organization"
+            )
+            if cached is not None:
+                return model.EmployeeAggregates(**cached)
+            generation = await self._cache_generation(_organization_key(organization_id))
+
         args = {'organization_id': organization_id}
-        rows = await self.db.select(get_employees_by_organization, args)
-        employees = model.Employee.serialize(rows) if rows else []
+        async with self._reads(use_cache):
+            rows = await self.db.select(
+                get_employee_aggregates_by_organization, args, query_name="get_employee_aggregates_by_organization"
+            )
+        aggregates = model.EmployeeAggregates.serialize(organization_id, rows)
 
-        return employees
+        if use_cache:
+            await self._cache_set_field(
+                _organization_key(organization_id), "aggregates", aggregates.to_dict(), generation
+            )
+
+        return aggregates
+
+    @traced_method()
+    async def get_organization_version(self, organization_id: int) -> int | None:
+        use_cache = self.cache is not None
+        generation = None
+        if use_cache:
+            version = await self._cache_get_field(_organization_key(organization_id), "version")
+            self._record_cache(int(version is not None), int(version is None), "get_employee_organization_version")
+            if version is not None:
+                return version
+            generation = await self._cache_generation(_organization_key(organization_id))
+
+        # По этой версии отвечают 304 без чтения строк, поэтому она читается из primary, а не с отстающей реплики
+        args = {'organization_id': organization_id}
+        async with self.db.primary():
+            rows = await self.db.select(
+                get_employee_organization_version, args, query_name="get_employee_organization_version"
+            )
+        if not rows:
+            return None
+
+        version = rows[0].version
+        if use_cache:
+            await self._cache_set_field(_organization_key(organization_id), "version", version, generation)
+
+        return version
+
+    async def stream_employees_by_organization(
+            self,
+            organization_id: int,
+            batch_size: int = 500
+    ) -> AsyncIterator[tuple[list[model.Employee], int | None]]:
+        args = {'organization_id': organization_id}
+        rows_stream = self.db.stream(
+            get_employees_by_organization, args, batch_size, query_name="stream_employees_by_organization"
+        )
+        async for rows in rows_stream:
+            yield model.Employee.serialize(rows), _organization_version(rows)
+
+    async def stream_employees_json_by_organization(
+            self,
+            organization_id: int,
+            page_size: int = 500
+    ) -> AsyncIterator[tuple[bytes, int | None]]:
+        args = {'organization_id': organization_id, 'limit': page_size}
+        query, query_name = get_employees_json_page_by_organization, "get_employees_json_page_by_organization"
+        while True:
+            # Страницы — отдельные запросы: из разных реплик одна выгрузка смешала бы их состояния,
+            # поэтому все страницы читаются из primary
+            async with self.db.primary():
+                rows = await self.db.select(query, args, query_name=query_name)
+            page = rows[0]
+            if page.count:
+                # Готовый JSON страницы уходит дальше как есть, строки сотрудников в Python не разбираются
+                yield page.employees, page.organization_version
+            if page.count < page_size:
+                return
+
+            args = {
+                'organization_id': organization_id,
+                'limit': page_size,
+                'cursor_created_at': page.last_created_at,
+                'cursor_id': page.last_id
+            }
+            query = get_employees_json_page_by_organization_after
+            query_name = "get_employees_json_page_by_organization_after"
 
     @traced_method()
     async def update_employee_permissions(
@@ -78,67 +394,142 @@ class EmployeeRepo(interface.IEmployeeRepo):
             sign_up_social_net_permission: bool = None,
             setting_category_permission: bool = None,
             setting_organization_permission: bool = None
-    ) -> None:
-        update_fields = []
-        args: dict = {'account_id': account_id}
+    ) -> int:
+        args = {
+            'account_id': account_id,
+            'required_moderation': required_moderation,
+            'autoposting_permission': autoposting_permission,
+            'add_employee_permission': add_employee_permission,
+            'edit_employee_perm_permission': edit_employee_perm_permission,
+            'top_up_balance_permission': top_up_balance_permission,
+            'sign_up_social_net_permission': sign_up_social_net_permission,
+            'setting_category_permission': setting_category_permission,
+            'setting_organization_permission': setting_organization_permission,
+        }
+        rows = await self.db.update(update_employee_permissions, args, query_name="update_employee_permissions")
+        await self._invalidate([account_id], [row.organization_id for row in rows])
+        return len(rows)
 
-        if required_moderation is not None:
-            update_fields.append("required_moderation = :required_moderation")
-            args['required_moderation'] = required_moderation
+    @traced_method()
+    async def update_employee_role(
+            self,
+            account_id: int,
+            role: model.EmployeeRole
+    ) -> int:
+        args = {
+            'account_id': account_id,
+            'role': role.value
+        }
+        rows = await self.db.update(update_employee_role, args, query_name="update_employee_role")
+        await self._invalidate([account_id], [row.organization_id for row in rows])
+        return len(rows)
 
-        if autoposting_permission is not None:
-            update_fields.append("autoposting_permission = :autoposting_permission")
-            args['autoposting_permission'] = autoposting_permission
+    @traced_method()
+    async def delete_employee(self, account_id: int) -> int:
+        args = {'account_id': account_id}
+        rows = await self.db.delete(delete_employee, args, query_name="delete_employee")
+        await self._invalidate([account_id], [row.organization_id for row in rows])
+        return len(rows)
 
-        if add_employee_permission is not None:
-            update_fields.append("add_employee_permission = :add_employee_permission")
-            args['add_employee_permission'] = add_employee_permission
+    def on_invalidate(self, handler: Callable[[list[int] | None], None]) -> None:
+        # handler получает account_id изменённых сотрудников; None — сбросить всё
+        self._invalidation_handlers.append(handler)
 
-        if edit_employee_perm_permission is not None:
-            update_fields.append("edit_employee_perm_permission = :edit_employee_perm_permission")
-            args['edit_employee_perm_permission'] = edit_employee_perm_permission
+    async def start_invalidation_listener(self) -> None:
+        if self.cache is None or self._invalidation_listener is not None:
+            return
+        self._invalidation_listener = asyncio.create_task(self._listen_invalidations())
 
-        if top_up_balance_permission is not None:
-            update_fields.append("top_up_balance_permission = :top_up_balance_permission")
-            args['top_up_balance_permission'] = top_up_balance_permission
+    async def stop_invalidation_listener(self) -> None:
+        if self._invalidation_listener is None:
+            return
+        self._invalidation_listener.cancel()
+        try:
+            await self._invalidation_listener
+        except asyncio.CancelledError:
+            pass
+        self._invalidation_listener = None
 
-        if sign_up_social_net_permission is not None:
-            update_fields.append("sign_up_social_net_permission = :sign_up_social_net_permission")
-            args['sign_up_social_net_permission'] = sign_up_social_net_permission
+    async def _listen_invalidations(self) -> None:
+        while True:
+            try:
+                async for message in self.cache.listen(employee_cache_channel):
+                    if isinstance(message, dict):
+                        self._notify_invalidated(message.get("account_ids", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                self.logger.warning(f"Подписка на инвалидацию кэша сотрудников прервана: {err}")
 
-        if setting_category_permission is not None:
-            update_fields.append("setting_category_permission = :setting_category_permission")
-            args['setting_category_permission'] = setting_category_permission
+            # Пока подписки не было, сообщения могли потеряться — локальные кэши сбрасываются целиком
+            self._notify_invalidated(None)
+            await asyncio.sleep(1)
 
-        if setting_organization_permission is not None:
-            update_fields.append("setting_organization_permission = :setting_organization_permission")
-            args['setting_organization_permission'] = setting_organization_permission
+    def _notify_invalidated(self, account_ids: list[int] | None) -> None:
+        for handler in self._invalidation_handlers:
+            handler(account_ids)
 
-        if not update_fields:
+    async def _invalidate(self, account_ids: list[int], organization_ids: list[int]) -> None:
+        self._notify_invalidated(account_ids)
+        if self.cache is None:
             return
 
-        # Формируем финальный запрос
-        query = f"""
-                UPDATE employees 
-                SET {', '.join(update_fields)}
-                WHERE account_id = :account_id;
-                """
+        keys = [
+            *[_account_key(account_id) for account_id in account_ids],
+            *[_organization_key(organization_id) for organization_id in organization_ids],
+        ]
+        try:
+            # Рост поколения не даёт чтению, начатому до записи, вернуть старое значение в кэш
+            await self.cache.invalidate(keys, [_generation_key(key) for key in keys], generation_ttl)
+            await self.cache.publish(
+                employee_cache_channel,
+                {"account_ids": account_ids, "organization_ids": organization_ids}
+            )
+        except Exception as err:
+            self.logger.warning(f"Не удалось инвалидировать кэш сотрудников: {err}")
 
-        await self.db.update(query, args)
+    async def _cache_get(self, keys: list[str]) -> list[Any]:
+        try:
+            return await self.cache.get_many(keys)
+        except Exception as err:
+            # Недоступный Redis не должен ломать чтение — идём в БД
+            self.logger.warning(f"Не удалось прочитать кэш сотрудников: {err}")
+            return [None] * len(keys)
 
-    @traced_method()
-    async def update_employee_role(
-            self,
-            account_id: int,
-            role: model.EmployeeRole
-    ) -> None:
-        args = {
-            'account_id': account_id,
-            'role': role.value
-        }
-        await self.db.update(update_employee_role, args)
+    async def _cache_get_field(self, key: str, field: str) -> Any:
+        try:
+            return await self.cache.hget(key, field)
+        except Exception as err:
+            self.logger.warning(f"Не удалось прочитать кэш сотрудников: {err}")
+            return None
 
-    @traced_method()
-    async def delete_employee(self, account_id: int) -> None:
-        args = {'account_id': account_id}
-        await self.db.update(delete_employee, args)
+    async def _cache_generation(self, key: str) -> Any:
+        try:
+            return await self.cache.get(_generation_key(key))
+        except Exception as err:
+            # Без поколения запись сработает, только если счётчика ещё нет
+            self.logger.warning(f"Не удалось прочитать кэш сотрудников: {err}")
+            return None
+
+    async def _cache_set_field(self, key: str, field: str, value: Any, generation: Any) -> None:
+        try:
+            await self.cache.hset_if(key, field, value, (_generation_key(key), generation), ttl=self.cache_ttl)
+        except Exception as err:
+            self.logger.warning(f"Не удалось записать кэш сотрудников: {err}")
+
+    async def _cache_set(self, values: dict[str, Any], generations: dict[str, Any]) -> None:
+        guards = {key: (_generation_key(key), generations.get(key)) for key in values}
+        try:
+            await self.cache.set_many_if(values, guards, ttl=self.cache_ttl)
+        except Exception as err:
+            self.logger.warning(f"Не удалось записать кэш сотрудников: {err}")
+
+    def _reads(self, primary: bool) -> AsyncContextManager[None]:
+        # Для общего кэша и после своей записи читаем из primary: реплика может ещё не видеть запись
+        return self.db.primary() if primary else nullcontext()
+
+    def _record_cache(self, hits: int, misses: int, query_name: str) -> None:
+        if hits:
+            self.cache_requests.add(hits, {"db.query.name": query_name, "result": "hit"})
+        if misses:
+            self.cache_requests.add(misses, {"db.query.name": query_name, "result": "miss"})
@@ -32,6 +32,25 @@ VALUES (
 RETURNING id;
 """
 
+employees_table = "employees"
+
+# Порядок колонок для COPY при массовом создании сотрудников
+employee_copy_columns = [
+    "organization_id",
+    "invited_from_account_id",
+    "account_id",
+    "name",
+    "role",
+    "required_moderation",
+    "autoposting_permission",
+    "add_employee_permission",
+    "edit_employee_perm_permission",
+    "top_up_balance_permission",
+    "sign_up_social_net_permission",
+    "setting_category_permission",
+    "setting_organization_permission",
+]
+
 get_employee_by_id = """
 SELECT * FROM employees
 WHERE account_id = :account_id;
@@ -42,19 +61,198 @@ SELECT * FROM employees
 WHERE account_id = :account_id;
 """
 
-get_employees_by_organization = """
+get_employees_by_account_ids = """
 SELECT * FROM employees
+WHERE account_id = ANY(:account_ids);
+"""
+
+# Версия организации читается тем же оператором, что и строки, — в одном снимке: ETag ответа
+# не может оказаться новее отданных сотрудников даже при чтении с реплики
+get_employees_by_organization = """
+SELECT *,
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM employees
+WHERE organization_id = :organization_id
+ORDER BY created_at DESC, id DESC;
+"""
+
+# Keyset-пагинация: страница читается диапазоном idx_employees_organization_created_at,
+# поэтому её стоимость не зависит от номера страницы
+get_employees_page_by_organization = """
+SELECT *,
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM employees
+WHERE organization_id = :organization_id
+ORDER BY created_at DESC, id DESC
+LIMIT :limit;
+"""
+
+get_employees_page_by_organization_after = """
+SELECT *,
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM employees
+WHERE organization_id = :organization_id
+  AND (created_at, id) < (:cursor_created_at, :cursor_id)
+ORDER BY created_at DESC, id DESC
+LIMIT :limit;
+"""
+
+# Биты permissions — см. model.EmployeePermission
+get_employee_aggregates_by_organization = """
+SELECT role,
+       COUNT(*) AS total,
+       COUNT(*) FILTER (WHERE permissions & 1 <> 0) AS required_moderation,
+       COUNT(*) FILTER (WHERE permissions & 2 <> 0) AS autoposting_permission,
+       COUNT(*) FILTER (WHERE permissions & 4 <> 0) AS add_employee_permission,
+       COUNT(*) FILTER (WHERE permissions & 8 <> 0) AS edit_employee_perm_permission,
+       COUNT(*) FILTER (WHERE permissions & 16 <> 0) AS top_up_balance_permission,
+       COUNT(*) FILTER (WHERE permissions & 32 <> 0) AS sign_up_social_net_permission,
+       COUNT(*) FILTER (WHERE permissions & 64 <> 0) AS setting_category_permission,
+       COUNT(*) FILTER (WHERE permissions & 128 <> 0) AS setting_organization_permission
+FROM employees
+WHERE organization_id = :organization_id
+GROUP BY role;
+"""
+
+# Шаблоны с проекцией: {columns} подставляется только из model.employee_fields
+get_employee_fields_page_by_organization = """
+SELECT {columns},
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM employees
+WHERE organization_id = :organization_id
+ORDER BY created_at DESC, id DESC
+LIMIT :limit;
+"""
+
+get_employee_fields_page_by_organization_after = """
+SELECT {columns},
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM employees
 WHERE organization_id = :organization_id
-ORDER BY created_at DESC;
+  AND (created_at, id) < (:cursor_created_at, :cursor_id)
+ORDER BY created_at DESC, id DESC
+LIMIT :limit;
+"""
+
+# JSON страницы собирает Postgres в форме model.Employee.to_dict(): порядок ключей, флаги из маски,
+# created_at как datetime.isoformat(). Страница приходит одной строкой bytea вместе с ключом
+# последнего сотрудника для следующей страницы
+get_employees_json_page_by_organization = """
+SELECT convert_to(string_agg(employee_json, ',' ORDER BY created_at DESC, id DESC), 'UTF8') AS employees,
+       COUNT(*) AS count,
+       (array_agg(created_at ORDER BY created_at, id))[1] AS last_created_at,
+       (array_agg(id ORDER BY created_at, id))[1] AS last_id,
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM (
+    SELECT e.id, e.created_at, row_to_json(item)::text AS employee_json
+    FROM employees e
+    CROSS JOIN LATERAL (
+        SELECT e.id,
+               e.organization_id,
+               e.invited_from_account_id,
+               e.account_id,
+               e.permissions & 1 <> 0 AS required_moderation,
+               e.permissions & 2 <> 0 AS autoposting_permission,
+               e.permissions & 4 <> 0 AS add_employee_permission,
+               e.permissions & 8 <> 0 AS edit_employee_perm_permission,
+               e.permissions & 16 <> 0 AS top_up_balance_permission,
+               e.permissions & 32 <> 0 AS sign_up_social_net_permission,
+               e.permissions & 64 <> 0 AS setting_category_permission,
+               e.permissions & 128 <> 0 AS setting_organization_permission,
+               e.name,
+               e.role,
+               to_char(
+                   e.created_at,
+                   CASE WHEN date_trunc('second', e.created_at) = e.created_at
+                       THEN 'YYYY-MM-DD"T"HH24:MI:SS'
+                       ELSE 'YYYY-MM-DD"T"HH24:MI:SS.US'
+                   END
+               ) AS created_at
+    ) item
+    WHERE e.organization_id = :organization_id
+    ORDER BY e.created_at DESC, e.id DESC
+    LIMIT :limit
+) page;
+"""
+
+get_employees_json_page_by_organization_after = """
+SELECT convert_to(string_agg(employee_json, ',' ORDER BY created_at DESC, id DESC), 'UTF8') AS employees,
+       COUNT(*) AS count,
+       (array_agg(created_at ORDER BY created_at, id))[1] AS last_created_at,
+       (array_agg(id ORDER BY created_at, id))[1] AS last_id,
+       (SELECT version FROM employee_organization_versions
+        WHERE organization_id = :organization_id) AS organization_version
+FROM (
+    SELECT e.id, e.created_at, row_to_json(item)::text AS employee_json
+    FROM employees e
+    CROSS JOIN LATERAL (
+        SELECT e.id,
+               e.organization_id,
+               e.invited_from_account_id,
+               e.account_id,
+               e.permissions & 1 <> 0 AS required_moderation,
+               e.permissions & 2 <> 0 AS autoposting_permission,
+               e.permissions & 4 <> 0 AS add_employee_permission,
+               e.permissions & 8 <> 0 AS edit_employee_perm_permission,
+               e.permissions & 16 <> 0 AS top_up_balance_permission,
+               e.permissions & 32 <> 0 AS sign_up_social_net_permission,
+               e.permissions & 64 <> 0 AS setting_category_permission,
+               e.permissions & 128 <> 0 AS setting_organization_permission,
+               e.name,
+               e.role,
+               to_char(
+                   e.created_at,
+                   CASE WHEN date_trunc('second', e.created_at) = e.created_at
+                       THEN 'YYYY-MM-DD"T"HH24:MI:SS'
+                       ELSE 'YYYY-MM-DD"T"HH24:MI:SS.US'
+                   END
+               ) AS created_at
+    ) item
+    WHERE e.organization_id = :organization_id
+      AND (e.created_at, e.id) < (:cursor_created_at, :cursor_id)
+    ORDER BY e.created_at DESC, e.id DESC
+    LIMIT :limit
+) page;
+"""
+
+# NULL в параметре оставляет текущее значение колонки — один текст запроса на любой набор флагов
+update_employee_permissions = """
+UPDATE employees
+SET required_moderation = COALESCE(:required_moderation, required_moderation),
+    autoposting_permission = COALESCE(:autoposting_permission, autoposting_permission),
+    add_employee_permission = COALESCE(:add_employee_permission, add_employee_permission),
+    edit_employee_perm_permission = COALESCE(:edit_employee_perm_permission, edit_employee_perm_permission),
+    top_up_balance_permission = COALESCE(:top_up_balance_permission, top_up_balance_permission),
+    sign_up_social_net_permission = COALESCE(:sign_up_social_net_permission, sign_up_social_net_permission),
+    setting_category_permission = COALESCE(:setting_category_permission, setting_category_permission),
+    setting_organization_permission = COALESCE(:setting_organization_permission, setting_organization_permission),
+    version = nextval('employee_version_seq')
+WHERE account_id = :account_id
+RETURNING id, organization_id;
 """
 
 update_employee_role = """
 UPDATE employees 
-SET role = :role
-WHERE account_id = :account_id;
+SET role = :role,
+    version = nextval('employee_version_seq')
+WHERE account_id = :account_id
+RETURNING id, organization_id;
 """
 
 delete_employee = """
 DELETE FROM employees
-WHERE account_id = :account_id;
-"""
\ No newline at end of file
+WHERE account_id = :account_id
+RETURNING id, organization_id;
+"""
+
+# Версию организации поднимает триггер employees_bump_organization_versions в транзакции записи
+get_employee_organization_version = """
+SELECT version FROM employee_organization_versions
+WHERE organization_id = :organization_id;
+"""
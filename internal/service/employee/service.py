@@ -1,7 +1,16 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable
+
+from opentelemetry.metrics import CallbackOptions, Observation
+
 from internal import interface, model, common
 from internal.interface.client.loom_tg_bot import ILoomTgBotClient
 
 from pkg.trace_wrapper import traced_method
+from pkg.ttl_cache import TTLCache
 
 
 class EmployeeService(interface.IEmployeeService):
@@ -10,11 +19,60 @@ class EmployeeService(interface.IEmployeeService):
             tel: interface.ITelemetry,
             employee_repo: interface.IEmployeeRepo,
             loom_tg_bot_client: ILoomTgBotClient,
+            notify_concurrency: int = 20,
+            permission_cache_size: int = 10000,
+            permission_cache_ttl: float = 30.0,
+            page_size: int = 50,
+            max_page_size: int = 200,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
         self.employee_repo = employee_repo
         self.loom_tg_bot_client = loom_tg_bot_client
+        self.notify_concurrency = notify_concurrency
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+        self._background_tasks: set[asyncio.Task] = set()
+
+        # account_id -> model.EmployeePermissionSnapshot
+        self.permission_cache = TTLCache(max_size=permission_cache_size, ttl=permission_cache_ttl)
+        # Изменения, сделанные другими репликами, приходят через репозиторий
+        self.employee_repo.on_invalidate(self._drop_permission_cache)
+
+        meter = tel.meter()
+        meter.create_observable_counter(
+            "employee.permission_cache.requests",
+            callbacks=[self._observe_permission_cache_requests],
+            description="Обращения к кэшу прав сотрудников по результату (hit/miss)",
+        )
+        meter.create_observable_counter(
+            "employee.permission_cache.evictions",
+            callbacks=[self._observe_permission_cache_evictions],
+            description="Записи, удалённые из кэша прав по размеру (size) или истечению TTL (ttl)",
+        )
+        meter.create_observable_gauge(
+            "employee.permission_cache.size",
+            callbacks=[self._observe_permission_cache_size],
+            description="Количество записей в кэше прав сотрудников",
+        )
+
+    def _drop_permission_cache(self, account_ids: list[int] | None) -> None:
+        if account_ids is None:
+            self.permission_cache.clear()
+        else:
+            self.permission_cache.invalidate(*account_ids)
+
+    def _observe_permission_cache_requests(self, options: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(self.permission_cache.hits, {"result": "hit"})
+        yield Observation(self.permission_cache.misses, {"result": "miss"})
+
+    def _observe_permission_cache_evictions(self, options: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(self.permission_cache.evictions, {"reason": "size"})
+        yield Observation(self.permission_cache.expirations, {"reason": "ttl"})
+
+    def _observe_permission_cache_size(self, options: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(len(self.permission_cache))
 
     @traced_method()
     async def create_employee(
@@ -30,25 +88,9 @@ class EmployeeService(interface.IEmployeeService):
             self.logger.info("Проверка прав приглашающего сотрудника")
             await self._check_employee_permission(invited_from_account_id, "add_employee_permission")
 
-        required_moderation = False
-        autoposting_permission = False
-        add_employee_permission = False
-        edit_employee_perm_permission = False
-        top_up_balance_permission = False
-        sign_up_social_net_permission = False
-        setting_category_permission = False
-        setting_organization_permission = False
-
         if role == "admin":
             self.logger.info("Назначение роли администратора")
-            required_moderation = False
-            autoposting_permission = True
-            add_employee_permission = True
-            edit_employee_perm_permission = True
-            top_up_balance_permission = True
-            sign_up_social_net_permission = True
-            setting_category_permission = True
-            setting_organization_permission = True
+        permissions = self._role_permissions(role)
 
         employee_id = await self.employee_repo.create_employee(
             organization_id=organization_id,
@@ -56,15 +98,9 @@ class EmployeeService(interface.IEmployeeService):
             account_id=account_id,
             name=name,
             role=role,
-            required_moderation=required_moderation,
-            autoposting_permission=autoposting_permission,
-            add_employee_permission=add_employee_permission,
-            edit_employee_perm_permission=edit_employee_perm_permission,
-            top_up_balance_permission=top_up_balance_permission,
-            sign_up_social_net_permission=sign_up_social_net_permission,
-            setting_category_permission=setting_category_permission,
-            setting_organization_permission=setting_organization_permission,
+            **permissions,
         )
+        self.permission_cache.invalidate(account_id)
 
         await self.loom_tg_bot_client.notify_employee_added(
             account_id=account_id,
@@ -75,6 +111,71 @@ class EmployeeService(interface.IEmployeeService):
 
         return employee_id
 
+    @traced_method()
+    async def create_employees(
+            self,
+            organization_id: int,
+            invited_from_account_id: int,
+            employees: list[dict]
+    ) -> list[int]:
+        if invited_from_account_id != 0:
+            self.logger.info("Проверка прав приглашающего сотрудника")
+            await self._check_employee_permission(invited_from_account_id, "add_employee_permission")
+
+        new_employees = [
+            {
+                "organization_id": organization_id,
+                "invited_from_account_id": invited_from_account_id,
+                "account_id": employee["account_id"],
+                "name": employee["name"],
+                "role": employee["role"],
+                **self._role_permissions(employee["role"]),
+            }
+            for employee in employees
+        ]
+
+        employee_ids = await self.employee_repo.create_employees(new_employees)
+        self.permission_cache.invalidate(*[employee["account_id"] for employee in employees])
+        self.logger.info(f"Создано сотрудников: {len(employee_ids)}")
+
+        # Уведомления не должны задерживать ответ на импорт тысяч сотрудников
+        task = asyncio.create_task(self._notify_employees_added(organization_id, employees))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+        return employee_ids
+
+    async def _notify_employees_added(self, organization_id: int, employees: list[dict]) -> None:
+        semaphore = asyncio.Semaphore(self.notify_concurrency)
+
+        async def _notify(employee: dict):
+            async with semaphore:
+                await self.loom_tg_bot_client.notify_employee_added(
+                    account_id=employee["account_id"],
+                    organization_id=organization_id,
+                    employee_name=employee["name"],
+                    role=employee["role"],
+                )
+
+        results = await asyncio.gather(*[_notify(employee) for employee in employees], return_exceptions=True)
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        if failed:
+            self.logger.warning(f"Не удалось отправить уведомления о добавлении: {failed} из {len(employees)}")
+
+    @staticmethod
+    def _role_permissions(role: str) -> dict:
+        is_admin = role == "admin"
+        return {
+            "required_moderation": False,
+            "autoposting_permission": is_admin,
+            "add_employee_permission": is_admin,
+            "edit_employee_perm_permission": is_admin,
+            "top_up_balance_permission": is_admin,
+            "sign_up_social_net_permission": is_admin,
+            "setting_category_permission": is_admin,
+            "setting_organization_permission": is_admin,
+        }
+
     @traced_method()
     async def get_employee_by_account_id(self, account_id: int) -> list[model.Employee]:
         employee = await self.employee_repo.get_employee_by_account_id(account_id)
@@ -82,10 +183,100 @@ class EmployeeService(interface.IEmployeeService):
         return employee
 
     @traced_method()
-    async def get_employees_by_organization(self, organization_id: int) -> list[model.Employee]:
-        employees = await self.employee_repo.get_employees_by_organization(organization_id)
+    async def get_employees_by_organization(
+            self,
+            organization_id: int,
+            limit: int | None = None,
+            cursor: str | None = None
+    ) -> tuple[list[model.Employee], str | None, int | None]:
+        limit = self._page_limit(limit)
+        after = self._decode_cursor(cursor) if cursor else None
 
-        return employees
+        # Лишняя строка показывает, есть ли следующая страница
+        employees, version = await self.employee_repo.get_employees_by_organization(
+            organization_id, limit + 1, after
+        )
+
+        next_cursor = None
+        if len(employees) > limit:
+            employees = employees[:limit]
+            next_cursor = self._encode_cursor(employees[-1].created_at.isoformat(), employees[-1].id)
+
+        return employees, next_cursor, version
+
+    @traced_method()
+    async def get_employee_fields_by_organization(
+            self,
+            organization_id: int,
+            fields: list[str],
+            limit: int | None = None,
+            cursor: str | None = None
+    ) -> tuple[list[dict], str | None, int | None]:
+        limit = self._page_limit(limit)
+        after = self._decode_cursor(cursor) if cursor else None
+
+        items, version = await self.employee_repo.get_employee_fields_by_organization(
+            organization_id, fields, limit + 1, after
+        )
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = self._encode_cursor(items[-1]["created_at"], items[-1]["id"])
+
+        # Колонки ключа пагинации выбирались для курсора — в ответ попадают, только если их запросили
+        extra_fields = {"id", "created_at"}.difference(fields)
+        if extra_fields:
+            for item in items:
+                for field in extra_fields:
+                    del item[field]
+
+        return items, next_cursor, version
+
+    @traced_method()
+    async def get_employee_aggregates_by_organization(self, organization_id: int) -> model.EmployeeAggregates:
+        return await self.employee_repo.get_employee_aggregates_by_organization(organization_id)
+
+    @traced_method()
+    async def get_organization_version(self, organization_id: int) -> int | None:
+        return await self.employee_repo.get_organization_version(organization_id)
+
+    def _page_limit(self, limit: int | None) -> int:
+        # Размер страницы ограничивается сервером независимо от запроса клиента
+        return max(1, min(limit or self.page_size, self.max_page_size))
+
+    @staticmethod
+    def _encode_cursor(created_at: str, employee_id: int) -> str:
+        payload = json.dumps([created_at, employee_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            created_at, employee_id = json.loads(payload)
+            created_at = datetime.fromisoformat(created_at)
+        except (ValueError, TypeError) as err:
+            raise common.ErrInvalidCursor() from err
+
+        # id в курсоре — только целое JSON: 1e999 или 1.5 не приводятся к int молча и не роняют запрос
+        if type(employee_id) is not int:
+            raise common.ErrInvalidCursor()
+
+        # Ключ уходит в запрос как timestamp без зоны и int4: иначе Postgres ответит ошибкой, а клиент — 500
+        if created_at.tzinfo is not None or not -2 ** 31 <= employee_id < 2 ** 31:
+            raise common.ErrInvalidCursor()
+
+        return created_at, employee_id
+
+    def stream_employees_by_organization(
+            self,
+            organization_id: int
+    ) -> AsyncIterator[tuple[list[model.Employee], int | None]]:
+        return self.employee_repo.stream_employees_by_organization(organization_id)
+
+    def stream_employees_json_by_organization(self, organization_id: int) -> AsyncIterator[tuple[bytes, int | None]]:
+        return self.employee_repo.stream_employees_json_by_organization(organization_id)
 
     @traced_method()
     async def update_employee_permissions(
@@ -100,12 +291,20 @@ class EmployeeService(interface.IEmployeeService):
             setting_category_permission: bool = None,
             setting_organization_permission: bool = None
     ) -> None:
-        employees = await self.employee_repo.get_employee_by_account_id(account_id)
-        if not employees:
-            self.logger.warning("Сотрудник не найден")
-            raise common.ErrEmployeeNotFound()
+        flags = (
+            required_moderation, autoposting_permission, add_employee_permission, edit_employee_perm_permission,
+            top_up_balance_permission, sign_up_social_net_permission, setting_category_permission,
+            setting_organization_permission
+        )
+        if all(flag is None for flag in flags):
+            # Без флагов запись ничего не меняет: строка не переписывается, версии и ETag клиентов остаются
+            if not await self.employee_repo.get_employee_by_account_id(account_id):
+                self.logger.warning("Сотрудник не найден")
+                raise common.ErrEmployeeNotFound()
+            return
 
-        await self.employee_repo.update_employee_permissions(
+        # Проверка существования и обновление — один запрос с RETURNING
+        updated = await self.employee_repo.update_employee_permissions(
             account_id=account_id,
             required_moderation=required_moderation,
             autoposting_permission=autoposting_permission,
@@ -116,6 +315,10 @@ class EmployeeService(interface.IEmployeeService):
             setting_category_permission=setting_category_permission,
             setting_organization_permission=setting_organization_permission
         )
+        self.permission_cache.invalidate(account_id)
+        if not updated:
+            self.logger.warning("Сотрудник не найден")
+            raise common.ErrEmployeeNotFound()
 
     @traced_method()
     async def update_employee_role(
@@ -123,24 +326,23 @@ class EmployeeService(interface.IEmployeeService):
             account_id: int,
             role: model.EmployeeRole
     ) -> None:
-        employees = await self.employee_repo.get_employee_by_account_id(account_id)
-        if not employees:
-            self.logger.warning("Сотрудник не найден")
-            raise common.ErrEmployeeNotFound()
-
-        await self.employee_repo.update_employee_role(
+        updated = await self.employee_repo.update_employee_role(
             account_id=account_id,
             role=role
         )
+        self.permission_cache.invalidate(account_id)
+        if not updated:
+            self.logger.warning("Сотрудник не найден")
+            raise common.ErrEmployeeNotFound()
 
     @traced_method()
     async def delete_employee(self, account_id: int) -> None:
-        employees = await self.employee_repo.get_employee_by_account_id(account_id)
-        if not employees:
+        deleted = await self.employee_repo.delete_employee(account_id)
+        self.permission_cache.invalidate(account_id)
+        if not deleted:
             self.logger.warning("Сотрудник не найден")
             raise common.ErrEmployeeNotFound()
 
-        await self.employee_repo.delete_employee(account_id)
         await self.loom_tg_bot_client.notify_employee_deleted(account_id)
 
     @traced_method()
@@ -157,34 +359,79 @@ class EmployeeService(interface.IEmployeeService):
             account_id: int,
             permission_type: str
     ) -> bool:
-        employees = await self.employee_repo.get_employee_by_account_id(account_id)
-        if not employees:
-            self.logger.warning("Сотрудник не найден")
-            raise common.ErrEmployeeNotFound()
-
-        employee = employees[0]
+        employee = await self._permission_snapshot(account_id)
 
-        # Админы имеют все права
         if employee.role == model.EmployeeRole.ADMIN:
             self.logger.info("Сотрудник является администратором")
             return True
 
-        # Проверяем конкретное разрешение
-        permission_map = {
-            "required_moderation": employee.required_moderation,
-            "autoposting_permission": employee.autoposting_permission,
-            "add_employee_permission": employee.add_employee_permission,
-            "edit_employee_perm_permission": employee.edit_employee_perm_permission,
-            "top_up_balance_permission": employee.top_up_balance_permission,
-            "sign_up_social_net_permission": employee.sign_up_social_net_permission,
-            "setting_category_permission": employee.setting_category_permission,
-            "setting_organization_permission": employee.setting_organization_permission,
-        }
-
-        has_permission = permission_map.get(permission_type, False)
-
-        if not has_permission:
+        if not employee.allows(permission_type):
             self.logger.warning("Недостаточно прав")
             raise common.ErrInsufficientPermissions(f"Employee {account_id} lacks permission: {permission_type}")
 
         return True
+
+    @traced_method()
+    async def check_employee_permissions(
+            self,
+            checks: list[tuple[int, str]]
+    ) -> dict[int, dict[str, bool]]:
+        snapshots = await self._permission_snapshots([account_id for account_id, _ in checks])
+
+        decisions: dict[int, dict[str, bool]] = {}
+        for account_id, permission_type in checks:
+            # Отсутствующий сотрудник не имеет прав
+            snapshot = snapshots.get(account_id)
+            decisions.setdefault(account_id, {})[permission_type] = (
+                    snapshot is not None and snapshot.allows(permission_type)
+            )
+
+        return decisions
+
+    @traced_method()
+    async def get_permission_snapshot(self, account_id: int) -> model.EmployeePermissionSnapshot:
+        return await self._permission_snapshot(account_id)
+
+    async def _permission_snapshot(self, account_id: int) -> model.EmployeePermissionSnapshot:
+        snapshot = self.permission_cache.get(account_id)
+        if snapshot is not None:
+            return snapshot
+
+        generation = self.permission_cache.generation
+        # Сразу после инвалидации реплика может ещё не видеть запись: кэш прав заполняется только из primary
+        async with self.employee_repo.primary():
+            employees = await self.employee_repo.get_employee_by_account_id(account_id)
+        if not employees:
+            self.logger.warning("Сотрудник не найден")
+            raise common.ErrEmployeeNotFound()
+
+        snapshot = employees[0].permission_snapshot()
+        self.permission_cache.set(account_id, snapshot, generation)
+
+        return snapshot
+
+    async def _permission_snapshots(self, account_ids: list[int]) -> dict[int, model.EmployeePermissionSnapshot]:
+        snapshots: dict[int, model.EmployeePermissionSnapshot] = {}
+        missing: list[int] = []
+        for account_id in dict.fromkeys(account_ids):
+            snapshot = self.permission_cache.get(account_id)
+            if snapshot is None:
+                missing.append(account_id)
+            else:
+                snapshots[account_id] = snapshot
+
+        if not missing:
+            return snapshots
+
+        # Все промахи кэша загружаются одним запросом
+        generation = self.permission_cache.generation
+        async with self.employee_repo.primary():
+            employees = await self.employee_repo.get_employees_by_account_ids(missing)
+        for account_id, account_employees in employees.items():
+            if not account_employees:
+                continue
+            snapshot = account_employees[0].permission_snapshot()
+            self.permission_cache.set(account_id, snapshot, generation)
+            snapshots[account_id] = snapshot
+
+        return snapshots
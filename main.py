@@ -3,6 +3,8 @@ from contextvars import ContextVar
 import uvicorn
 
 from infrastructure.pg.pg import PG
+from infrastructure.pg.raw_pg import RawPG
+from infrastructure.redis_client.redis_client import RedisClient
 from infrastructure.telemetry.telemetry import Telemetry, AlertManager
 
 from pkg.client.internal.loom_authorization.client import LoomAuthorizationClient
@@ -47,7 +49,56 @@ tel = Telemetry(
 )
 
 # Инициализация клиентов
-db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
+if cfg.db_driver == "asyncpg":
+    db = RawPG(
+        tel,
+        cfg.db_user,
+        cfg.db_pass,
+        cfg.db_host,
+        cfg.db_port,
+        cfg.db_name,
+        statement_cache_size=cfg.db_statement_cache_size,
+        prepared_statement_cache_size=cfg.db_prepared_statement_cache_size,
+        pool_min_size=cfg.db_pool_size,
+        pool_max_size=cfg.db_pool_size + cfg.db_max_overflow,
+        pool_recycle=cfg.db_pool_recycle,
+        statement_timeout=cfg.db_statement_timeout,
+        statement_timeouts=cfg.db_statement_timeouts,
+    )
+else:
+    db = PG(
+        tel,
+        cfg.db_user,
+        cfg.db_pass,
+        cfg.db_host,
+        cfg.db_port,
+        cfg.db_name,
+        statement_cache_size=cfg.db_statement_cache_size,
+        prepared_statement_cache_size=cfg.db_prepared_statement_cache_size,
+        pool_size=cfg.db_pool_size,
+        max_overflow=cfg.db_max_overflow,
+        replica_hosts=cfg.db_replica_hosts,
+        read_pool_size=cfg.db_read_pool_size,
+        read_max_overflow=cfg.db_read_max_overflow,
+        replica_max_lag=cfg.db_replica_max_lag,
+        replica_check_interval=cfg.db_replica_check_interval,
+        pool_recycle=cfg.db_pool_recycle,
+        pool_pre_ping=cfg.db_pool_pre_ping,
+        pool_timeout=cfg.db_pool_timeout,
+        statement_timeout=cfg.db_statement_timeout,
+        statement_timeouts=cfg.db_statement_timeouts,
+        timeout_pool_size=cfg.db_timeout_pool_size,
+        timeout_max_overflow=cfg.db_timeout_max_overflow,
+    )
+
+employee_cache = None
+if cfg.employee_cache_enabled:
+    employee_cache = RedisClient(
+        host=cfg.employee_redis_host,
+        port=cfg.employee_redis_port,
+        db=cfg.employee_redis_db,
+        password=cfg.employee_redis_password
+    )
 
 # Инициализация внешних клиентов
 loom_authorization_client = LoomAuthorizationClient(
@@ -66,23 +117,36 @@ loom_tg_bot_client = LoomTgBotClient(
 )
 
 # Инициализация репозиториев
-employee_repo = EmployeeRepo(tel, db)
+employee_repo = EmployeeRepo(tel, db, cache=employee_cache, cache_ttl=cfg.employee_cache_ttl)
 
 # Инициализация сервисов
 employee_service = EmployeeService(
     tel=tel,
     employee_repo=employee_repo,
-    loom_tg_bot_client=loom_tg_bot_client
+    loom_tg_bot_client=loom_tg_bot_client,
+    permission_cache_size=cfg.permission_cache_size,
+    permission_cache_ttl=cfg.permission_cache_ttl,
+    page_size=cfg.employee_page_size,
+    max_page_size=cfg.employee_max_page_size,
 )
 
 # Инициализация контроллеров
 employee_controller = EmployeeController(tel, employee_service)
 
 # Инициализация middleware
-http_middleware = HttpMiddleware(tel, loom_authorization_client, cfg.prefix, log_context)
+http_middleware = HttpMiddleware(
+    tel,
+    loom_authorization_client,
+    cfg.prefix,
+    log_context,
+    compression_min_size=cfg.http_compression_min_size,
+    compression_level=cfg.http_compression_level,
+    compression_offload_size=cfg.http_compression_offload_size,
+)
 
 app = NewHTTP(
     db=db,
+    employee_repo=employee_repo,
     employee_controller=employee_controller,
     http_middleware=http_middleware,
     prefix=cfg.prefix,
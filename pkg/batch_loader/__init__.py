@@ -0,0 +1 @@
+from pkg.batch_loader.batch_loader import BatchLoader
\ No newline at end of file
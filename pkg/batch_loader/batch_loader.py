@@ -0,0 +1,78 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class BatchLoader:
+    """
+    Собирает ключи, запрошенные за одну итерацию event loop, в один вызов batch_fn.
+    Повторяющиеся ключи в пачке загружаются один раз, результат получают все ожидающие.
+    Пачка выполняется в пустом контексте: контекст первого вызвавшего не должен влиять на чужие ключи.
+    Если pinned() истинен хотя бы у одного ожидающего, batch_fn получает pinned=True.
+    """
+
+    def __init__(
+            self,
+            batch_fn: Callable[[list, bool], Awaitable[dict]],
+            max_batch_size: int = 500,
+            default: Any = None,
+            pinned: Callable[[], bool] = lambda: False,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.default = default
+        self.pinned = pinned
+
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self._pending_pinned = False
+        self._dispatch_handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any:
+        # Признак читается в контексте вызывающего, пока он ещё доступен
+        if self.pinned():
+            self._pending_pinned = True
+
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._dispatch_handle is None:
+                self._dispatch_handle = loop.call_soon(self._dispatch, context=contextvars.Context())
+
+        # Отмена одного ожидающего не должна отменять общий результат пачки
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._dispatch_handle is not None:
+            self._dispatch_handle.cancel()
+            self._dispatch_handle = None
+
+        pending, self._pending = self._pending, {}
+        pinned, self._pending_pinned = self._pending_pinned, False
+        if not pending:
+            return
+
+        task = asyncio.get_running_loop().create_task(
+            self._load_batch(pending, pinned),
+            context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, pending: dict[Hashable, asyncio.Future], pinned: bool) -> None:
+        try:
+            results = await self.batch_fn(list(pending), pinned)
+        except Exception as err:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(results.get(key, self.default))
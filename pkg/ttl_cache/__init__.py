@@ -0,0 +1 @@
+from pkg.ttl_cache.ttl_cache import TTLCache
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру кэш с временем жизни записей и вытеснением давно не читанных (LRU).
+    Счётчики hits/misses/evictions/expirations накопительные — их удобно отдавать в observable метрики.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 10000,
+            ttl: float = 30.0,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        # Растёт при каждой инвалидации: значение, загруженное до неё, не попадёт в кэш
+        self.generation = 0
+
+        self._items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at <= self.clock():
+            del self._items[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+
+        self._items[key] = (self.clock() + self.ttl, value)
+        self._items.move_to_end(key)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        self.generation += 1
+        for key in keys:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)